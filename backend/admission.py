@@ -0,0 +1,196 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, priority: int, seq: int, kind: str, client: str):
+        self.priority = priority
+        self.seq = seq
+        self.kind = kind
+        self.client = client
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+# Each request kind has its own global and per-client concurrency limit, but
+# all kinds share one bounded wait queue. Freed slots are handed to waiters in
+# priority order, so cheap queries overtake queued ingest work.
+class AdmissionController:
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, int]],
+        priorities: Dict[str, int],
+        max_queue: int,
+        max_queue_per_client: int,
+        max_wait: float
+    ):
+        self.limits = limits
+        self.priorities = priorities
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.max_wait = max_wait
+
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._active: Dict[str, int] = {kind: 0 for kind in limits}
+        self._active_by_client: Dict[Tuple[str, str], int] = {}
+        self._admitted: Dict[str, int] = {kind: 0 for kind in limits}
+        self._rejected: Dict[str, int] = {kind: 0 for kind in limits}
+        self._wait_times: Dict[str, Deque[float]] = {kind: deque(maxlen=1000) for kind in limits}
+        self._service_time: Dict[str, float] = {kind: 1.0 for kind in limits}
+
+    def _can_run(self, kind: str, client: str) -> bool:
+        global_limit, client_limit = self.limits[kind]
+        return (
+            self._active[kind] < global_limit
+            and self._active_by_client.get((kind, client), 0) < client_limit
+        )
+
+    def _grant(self, kind: str, client: str, waited: float):
+        self._active[kind] += 1
+        self._active_by_client[(kind, client)] = self._active_by_client.get((kind, client), 0) + 1
+        self._admitted[kind] += 1
+        self._wait_times[kind].append(waited)
+
+    def _dispatch(self):
+        for waiter in list(self._waiters):
+            if waiter.future.done():
+                self._waiters.remove(waiter)
+            elif self._can_run(waiter.kind, waiter.client):
+                self._waiters.remove(waiter)
+                self._grant(waiter.kind, waiter.client, time.monotonic() - waiter.enqueued_at)
+                waiter.future.set_result(True)
+
+    def _retry_after(self, kind: str) -> int:
+        queued = sum(1 for w in self._waiters if w.kind == kind)
+        global_limit, _ = self.limits[kind]
+        return max(1, math.ceil(self._service_time[kind] * (queued + 1) / global_limit))
+
+    def _reject(self, kind: str, status_code: int, detail: str):
+        self._rejected[kind] += 1
+        retry_after = self._retry_after(kind)
+        logger.warning(f"Rejected {kind} request ({status_code}): {detail}; retry after {retry_after}s")
+        raise AdmissionRejected(status_code, detail, retry_after)
+
+    def _shed(self, waiter: _Waiter):
+        self._waiters.remove(waiter)
+        self._rejected[waiter.kind] += 1
+        retry_after = self._retry_after(waiter.kind)
+        logger.warning(f"Shed queued {waiter.kind} request to make room for higher-priority work")
+        waiter.future.set_exception(
+            AdmissionRejected(503, "Server is at capacity", retry_after)
+        )
+
+    async def acquire(self, kind: str, client: str):
+        if self._can_run(kind, client):
+            self._grant(kind, client, 0.0)
+            return
+
+        queued_for_client = sum(1 for w in self._waiters if w.kind == kind and w.client == client)
+        if queued_for_client >= self.max_queue_per_client:
+            self._reject(kind, 429, "Too many concurrent requests from this client")
+        priority = self.priorities.get(kind, 0)
+        if len(self._waiters) >= self.max_queue:
+            lowest = self._waiters[-1]
+            if lowest.priority <= priority:
+                self._reject(kind, 503, "Server is at capacity")
+            self._shed(lowest)
+
+        waiter = _Waiter(priority, next(self._seq), kind, client)
+        bisect.insort(self._waiters, waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                return
+            waiter.future.cancel()
+            self._waiters.remove(waiter)
+            self._reject(kind, 503, f"Timed out after {self.max_wait:.0f}s waiting for capacity")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(kind, client)
+            else:
+                waiter.future.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(self, kind: str, client: str, service_time: Optional[float] = None):
+        self._active[kind] -= 1
+        key = (kind, client)
+        self._active_by_client[key] -= 1
+        if not self._active_by_client[key]:
+            del self._active_by_client[key]
+        if service_time is not None:
+            self._service_time[kind] = 0.8 * self._service_time[kind] + 0.2 * service_time
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, kind: str, client: str):
+        await self.acquire(kind, client)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(kind, client, time.monotonic() - started)
+
+    def metrics(self) -> Dict:
+        result = {"queue_depth": len(self._waiters), "queue_capacity": self.max_queue, "kinds": {}}
+        for kind, (global_limit, client_limit) in self.limits.items():
+            waits = sorted(self._wait_times[kind])
+            result["kinds"][kind] = {
+                "active": self._active[kind],
+                "queued": sum(1 for w in self._waiters if w.kind == kind),
+                "global_limit": global_limit,
+                "per_client_limit": client_limit,
+                "admitted": self._admitted[kind],
+                "rejected": self._rejected[kind],
+                "wait_seconds_avg": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "wait_seconds_p95": round(waits[int(0.95 * (len(waits) - 1))], 4) if waits else 0.0,
+                "wait_seconds_max": round(waits[-1], 4) if waits else 0.0,
+                "service_seconds_avg": round(self._service_time[kind], 4)
+            }
+        return result
+
+
+admission = AdmissionController(
+    limits={
+        "query": (
+            int(os.getenv("QUERY_MAX_CONCURRENCY", "8")),
+            int(os.getenv("QUERY_MAX_PER_CLIENT", "2"))
+        ),
+        "ingest": (
+            int(os.getenv("INGEST_MAX_CONCURRENCY", "2")),
+            int(os.getenv("INGEST_MAX_PER_CLIENT", "1"))
+        )
+    },
+    priorities={"query": 0, "ingest": 1},
+    max_queue=int(os.getenv("ADMISSION_QUEUE_SIZE", "32")),
+    max_queue_per_client=int(os.getenv("ADMISSION_QUEUE_PER_CLIENT", "4")),
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30"))
+)
@@ -1,7 +1,6 @@
 import logging
 import json
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from models import GraphState
 
 logger = logging.getLogger(__name__)
@@ -39,6 +38,8 @@ def generate_comprehensive_summary(state: GraphState) -> GraphState:
         
         paper_abstracts_with_titles = "\n\n".join(papers_content)
         
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
         gemini_api_key = os.getenv("GEMINI_API_KEY")
         
         llm = ChatGoogleGenerativeAI(
@@ -1,5 +1,4 @@
 import logging
-import arxiv
 from models import GraphState
 
 logger = logging.getLogger(__name__)
@@ -13,6 +12,8 @@ def fetch_papers(state: GraphState) -> GraphState:
     logger.info(f"Fetching papers for topic: {state['topic']}")
     
     try:
+        import arxiv
+
         search = arxiv.Search(
             query=state["topic"],
             max_results=5,
@@ -1,5 +1,4 @@
 import logging
-from langchain_ollama import OllamaLLM
 from models import GraphState
 
 logger = logging.getLogger(__name__)
@@ -13,6 +12,8 @@ def summarize_papers(state: GraphState) -> GraphState:
     logger.info(f"Generating individual summaries for {len(state['papers'])} papers")
     
     try:
+        from langchain_ollama import OllamaLLM
+
         llm = OllamaLLM(
             model="qwen2.5:0.5b",
             temperature=0.5
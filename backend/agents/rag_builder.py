@@ -1,96 +1,181 @@
 import logging
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from pypdf import PdfReader
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone, ServerlessSpec
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from embeddings import get_embedder
 from models import GraphState
-from utils import chunk_text
+from utils import chunk_text, split_sentences
+from vector_store import abstract_id, chunk_id, upsert_chunks
+from sentence_store import get_sentence_store
+from corpus import acquire_papers, unindexed_papers, mark_indexed, mark_full_text_failed, is_referenced
+import job_queue
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-_embedder = None
+CHUNK_SIZE = 350
+CHUNK_OVERLAP = 80
+SENTENCE_INDEX = os.getenv("SENTENCE_INDEX", "true").lower() == "true"
+FULL_TEXT_WORKERS = int(os.getenv("FULL_TEXT_WORKERS", "2"))
 
-def get_embedder():
-    global _embedder
-    if _embedder is None:
-        _embedder = SentenceTransformer("all-MiniLM-L6-v2")
-    return _embedder
+_full_text_pool: Optional[ThreadPoolExecutor] = None
 
 
 def extract_text_from_pdf(url: str) -> str:
+    import requests
+    from pypdf import PdfReader
+
     r = requests.get(url, timeout=30)
     r.raise_for_status()
     reader = PdfReader(BytesIO(r.content))
     return "\n".join(filter(None, (p.extract_text() for p in reader.pages)))
 
 
+def embed_paper(paper: Dict) -> Optional[Dict]:
+    try:
+        text = extract_text_from_pdf(paper["pdf_url"]) if paper.get("pdf_url") else paper["abstract"]
+    except Exception:
+        text = paper["abstract"]
+
+    chunks = [
+        (i, chunk) for i, chunk in enumerate(chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP))
+        if len(chunk.strip()) >= 50
+    ]
+
+    if not chunks:
+        return None
+
+    sentences = split_sentences(text) if SENTENCE_INDEX else []
+
+    # Chunks and sentences go through the model in one batched encode call.
+    embeddings = get_embedder().encode(
+        [chunk for _, chunk in chunks] + [sentence for _, sentence in sentences],
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
+
+    return {
+        "ids": [chunk_id(paper["arxiv_id"], n) for n in range(len(chunks))],
+        "embeddings": embeddings[:len(chunks)],
+        "metadatas": [
+            {
+                "arxiv_id": paper["arxiv_id"],
+                "title": paper["title"],
+                "chunk_index": i,
+                "chunk_count": len(chunks),
+                "tier": 1
+            }
+            for i, _ in chunks
+        ],
+        "texts": [chunk for _, chunk in chunks],
+        "sentences": [sentence for _, sentence in sentences],
+        "sentence_word_starts": [start for start, _ in sentences],
+        "sentence_embeddings": embeddings[len(chunks):]
+    }
+
+
+def embed_abstracts(papers: List[Dict]) -> Dict:
+    papers = [paper for paper in papers if paper.get("abstract")]
+    embeddings = get_embedder().encode(
+        [paper["abstract"] for paper in papers],
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
+    return {
+        "ids": [abstract_id(paper["arxiv_id"]) for paper in papers],
+        "embeddings": embeddings,
+        "metadatas": [
+            {"arxiv_id": paper["arxiv_id"], "title": paper["title"], "chunk_index": 0, "tier": 0}
+            for paper in papers
+        ],
+        "texts": [paper["abstract"] for paper in papers]
+    }
+
+
+def index_embedded_paper(arxiv_id: str, embedded: Optional[Dict]):
+    # A paper with no usable full text keeps answering from its abstract.
+    if not embedded or not embedded["ids"]:
+        mark_indexed(arxiv_id, 0)
+        return
+
+    upsert_chunks(
+        ids=embedded["ids"],
+        embeddings=embedded["embeddings"],
+        metadatas=embedded["metadatas"],
+        texts=embedded["texts"],
+        replaces=[abstract_id(arxiv_id)]
+    )
+    if embedded.get("sentences"):
+        get_sentence_store().put(
+            arxiv_id,
+            embedded["sentences"],
+            embedded["sentence_word_starts"],
+            embedded["sentence_embeddings"]
+        )
+    mark_indexed(arxiv_id, len(embedded["ids"]))
+
+
+def _index_full_text(paper: Dict):
+    # Sessions may expire before their turn in the pool comes up.
+    if not is_referenced(paper["arxiv_id"]):
+        return
+    mark_full_text_failed(paper["arxiv_id"], None)
+    try:
+        embedded = embed_paper(paper)
+        # The download and embedding take long enough for the last session to
+        # expire; its garbage collection has run, so nothing would free these.
+        if not is_referenced(paper["arxiv_id"]):
+            return
+        index_embedded_paper(paper["arxiv_id"], embedded)
+    except Exception as e:
+        logger.error(f"Error indexing full text of {paper['arxiv_id']}: {str(e)}")
+        mark_full_text_failed(paper["arxiv_id"], str(e))
+
+
+def _submit_full_text(papers: List[Dict]):
+    global _full_text_pool
+    if _full_text_pool is None:
+        _full_text_pool = ThreadPoolExecutor(max_workers=FULL_TEXT_WORKERS, thread_name_prefix="full-text")
+    for paper in papers:
+        _full_text_pool.submit(_index_full_text, paper)
+
+
 def build_rag_system(state: GraphState) -> GraphState:
     papers = state.get("papers", [])
     if not papers:
         return state
 
-    pinecone_api_key = os.getenv("PINECONE_API_KEY")
-    if not pinecone_api_key:
-        raise ValueError("Missing PINECONE_API_KEY")
-
-    pc = Pinecone(api_key=pinecone_api_key)
-    index_name = os.getenv("PINECONE_INDEX_NAME", "research-papers-rag")
-
-    if index_name not in [i.name for i in pc.list_indexes()]:
-        pc.create_index(
-            name=index_name,
-            dimension=384,
-            metric="cosine",
-            spec=ServerlessSpec(
-                cloud="aws",
-                region=os.getenv("PINECONE_ENVIRONMENT", "us-east-1")
-            )
-        )
-
-    index = pc.Index(index_name)
-    embedder = get_embedder()
-
-    vectors = []
     session_id = state["session_id"]
-    chunk_counter = 0
+    acquire_papers(session_id, [paper["arxiv_id"] for paper in papers])
 
-    for paper in papers:
-        try:
-            text = extract_text_from_pdf(paper["pdf_url"]) if paper.get("pdf_url") else paper["abstract"]
-        except Exception:
-            text = paper["abstract"]
-
-        chunks = chunk_text(text, chunk_size=350, overlap=80)
-
-        for i, chunk in enumerate(chunks):
-            if len(chunk.strip()) < 50:
-                continue
-
-            embedding = embedder.encode(chunk, normalize_embeddings=True).tolist()
-
-            vectors.append({
-                "id": f"{session_id}_{chunk_counter}",
-                "values": embedding,
-                "metadata": {
-                    "session_id": session_id,
-                    "arxiv_id": paper["arxiv_id"],
-                    "title": paper["title"],
-                    "chunk_index": i,
-                    "text": chunk[:900]
-                }
-            })
-            chunk_counter += 1
-
-    for i in range(0, len(vectors), 100):
-        index.upsert(
-            vectors=vectors[i:i + 100],
-            namespace=session_id
-        )
+    pending = set(unindexed_papers([paper["arxiv_id"] for paper in papers]))
+    logger.info(f"{len(papers) - len(pending)} of {len(papers)} papers already in the shared corpus")
 
     state["rag_ready"] = True
-    state["rag_progress"] = "ready"
+    if not pending:
+        state["rag_progress"] = "ready"
+        return state
+
+    # Tier 0: the abstracts are already in hand, so one batched encode makes
+    # the session queryable before any PDF is downloaded.
+    pending_papers = [paper for paper in papers if paper["arxiv_id"] in pending]
+    abstracts = embed_abstracts(pending_papers)
+    if abstracts["ids"]:
+        upsert_chunks(**abstracts)
+    logger.info(f"Indexed {len(abstracts['ids'])} abstracts for session {session_id}")
+
+    # Tier 1: full text replaces each paper's abstract vector as it lands.
+    if job_queue.INGEST_MODE == "queue":
+        job_queue.enqueue(session_id, "rag_build", {
+            "session_id": session_id,
+            "papers": pending_papers
+        })
+        logger.info(f"Queued RAG build job {session_id} for {len(pending)} papers")
+        state["rag_progress"] = "abstracts indexed, full text queued"
+        return state
+
+    _submit_full_text(pending_papers)
+    state["rag_progress"] = f"abstracts indexed, full text 0/{len(pending)}"
     return state
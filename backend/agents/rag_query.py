@@ -1,71 +1,61 @@
 import logging
 import os
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
-from langchain_ollama import OllamaLLM
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from dotenv import load_dotenv
+from embeddings import get_embedder
+from vector_store import query_chunks, query_chunks_many
+from sentence_store import get_sentence_store
+from memory import render_history, record_turn
+from utils import split_sentences
+from agents.rag_builder import CHUNK_SIZE, CHUNK_OVERLAP
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-_embedder = None
-_memory = {}
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+EXTRACTIVE_TOP_SENTENCES = int(os.getenv("EXTRACTIVE_TOP_SENTENCES", "3"))
+EXTRACTIVE_MIN_CONFIDENCE = float(os.getenv("EXTRACTIVE_MIN_CONFIDENCE", "0.55"))
+NO_CONTEXT_ANSWER = "I don't have enough information in the research papers to answer this question."
 
-def get_embedder():
-    global _embedder
-    if _embedder is None:
-        _embedder = SentenceTransformer('all-MiniLM-L6-v2')
-    return _embedder
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
 
 
-def query_rag(session_id: str, question: str) -> dict:
-    logger.info(f"Processing RAG query for session {session_id}: {question[:50]}...")
-    
-    try:
-        pinecone_api_key = os.getenv("PINECONE_API_KEY")
-        if not pinecone_api_key:
-            raise ValueError("PINECONE_API_KEY not found in environment variables")
-        
-        pc = Pinecone(api_key=pinecone_api_key)
-        index_name = os.getenv("PINECONE_INDEX_NAME", "research-papers-rag")
-        index = pc.Index(index_name)
-        
-        embedder = get_embedder()
-        question_embedding = embedder.encode(question).tolist()
-        
-        results = index.query(
-            vector=question_embedding,
-            top_k=5,
-            namespace=session_id,
-            include_metadata=True
-        )
-        
-        if not results.matches:
-            return {
-                "answer": "I don't have enough information in the research papers to answer this question.",
-                "sources": []
+def _answering_tier(matches: List[Dict]) -> Optional[int]:
+    # 0 when any retrieved chunk is still an abstract placeholder, 1 once the
+    # answer rests on full text only. Chunks indexed before tiers carry no tag.
+    if not matches:
+        return None
+    return min(int(match["metadata"].get("tier", 1)) for match in matches)
+
+
+def _context_and_sources(matches: List[Dict]):
+    retrieved_chunks = []
+    sources_map = {}
+
+    for match in matches:
+        metadata = match["metadata"]
+        retrieved_chunks.append(metadata.get("text", ""))
+        arxiv_id = metadata.get("arxiv_id", "")
+        if arxiv_id and arxiv_id not in sources_map:
+            sources_map[arxiv_id] = {
+                "arxiv_id": arxiv_id,
+                "title": metadata.get("title", ""),
+                "relevance": f"Relevance score: {match['score']:.2f}"
             }
-        
-        retrieved_chunks = []
-        sources_map = {}
-        
-        for match in results.matches:
-            metadata = match.metadata
-            retrieved_chunks.append(metadata.get("text", ""))
-            arxiv_id = metadata.get("arxiv_id", "")
-            if arxiv_id and arxiv_id not in sources_map:
-                sources_map[arxiv_id] = {
-                    "arxiv_id": arxiv_id,
-                    "title": metadata.get("title", ""),
-                    "relevance": f"Relevance score: {match.score:.2f}"
-                }
-        
-        context = "\n\n".join(retrieved_chunks)
-        history = "\n".join(_memory.get(session_id, []))
-        
-        llm = OllamaLLM(model="qwen2.5:0.5b", temperature=0.3)
-        
-        prompt = f"""You are a careful research assistant.
+
+    return "\n\n".join(retrieved_chunks), list(sources_map.values())
+
+
+def _generate_answer(question: str, context: str, history: str) -> str:
+    from langchain_ollama import OllamaLLM
+
+    llm = OllamaLLM(model="qwen2.5:0.5b", temperature=0.3)
+
+    prompt = f"""You are a careful research assistant.
 
 Use the conversation history only for continuity.
 Answer the question using ONLY the information in the context.
@@ -83,18 +73,180 @@ Context:
 If the context is insufficient, clearly say that the answer cannot be determined.
 
 Answer:"""
-        
-        answer = llm.invoke(prompt).strip()
-        # _memory.setdefault(session_id, []).append(f"Q: {question}\nA: {answer}")
-        
+
+    with _llm_slots:
+        return llm.invoke(prompt).strip()
+
+
+def _candidate_sentences(matches: List[Dict]) -> Tuple[List[Tuple[str, str]], Optional[np.ndarray]]:
+    store = get_sentence_store()
+    candidates = []
+    vectors = []
+    unindexed = []
+    seen = set()
+
+    for match in matches:
+        metadata = match["metadata"]
+        arxiv_id = metadata.get("arxiv_id", "")
+        is_abstract = metadata.get("tier", 1) == 0
+        entry = store.get(arxiv_id) if arxiv_id and not is_abstract else None
+
+        if entry is None:
+            # Abstracts and papers indexed before the sentence store existed
+            # are split on the fly.
+            for _, sentence in split_sentences(metadata.get("text", "")):
+                if (arxiv_id, sentence) not in seen:
+                    seen.add((arxiv_id, sentence))
+                    unindexed.append((arxiv_id, sentence))
+            continue
+
+        start = int(metadata.get("chunk_index", 0)) * (CHUNK_SIZE - CHUNK_OVERLAP)
+        in_window = np.flatnonzero((entry["word_starts"] >= start) & (entry["word_starts"] < start + CHUNK_SIZE))
+        for row in in_window:
+            if (arxiv_id, int(row)) not in seen:
+                seen.add((arxiv_id, int(row)))
+                candidates.append((arxiv_id, entry["sentences"][row]))
+                vectors.append(entry["embeddings"][row])
+
+    if unindexed:
+        candidates += unindexed
+        vectors += list(get_embedder().encode(
+            [sentence for _, sentence in unindexed],
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ))
+
+    if not candidates:
+        return [], None
+    return candidates, np.asarray(vectors, dtype=np.float32)
+
+
+def _extract_answer(question_embedding: np.ndarray, matches: List[Dict]) -> Tuple[Optional[str], float]:
+    candidates, vectors = _candidate_sentences(matches)
+    if not candidates:
+        return None, 0.0
+
+    scores = vectors @ np.asarray(question_embedding, dtype=np.float32)
+    top = np.argsort(-scores)[:EXTRACTIVE_TOP_SENTENCES]
+    answer = " ".join(f"{candidates[i][1]} [{candidates[i][0]}]" for i in top)
+    return answer, float(scores[top[0]])
+
+
+def query_rag(session_id: str, question: str, arxiv_ids: List[str], mode: str = "generative") -> dict:
+    logger.info(f"Processing RAG query for session {session_id} ({mode}): {question[:50]}...")
+
+    try:
+        embedder = get_embedder()
+        question_embedding = embedder.encode(question, normalize_embeddings=True)
+
+        matches = query_chunks(question_embedding, top_k=5, arxiv_ids=arxiv_ids)
+
+        if not matches:
+            return {
+                "answer": NO_CONTEXT_ANSWER,
+                "sources": [],
+                "mode": mode,
+                "confidence": None,
+                "tier": None
+            }
+
+        context, sources = _context_and_sources(matches)
+        tier = _answering_tier(matches)
+
+        # Extractive answers skip the LLM entirely; auto mode only falls back
+        # to generation when the best sentence is a weak match.
+        if mode in ("extractive", "auto"):
+            answer, confidence = _extract_answer(question_embedding, matches)
+            if answer and (mode == "extractive" or confidence >= EXTRACTIVE_MIN_CONFIDENCE):
+                record_turn(session_id, question, answer)
+                return {
+                    "answer": answer,
+                    "sources": sources,
+                    "mode": "extractive",
+                    "confidence": round(confidence, 4),
+                    "tier": tier
+                }
+            if mode == "extractive":
+                return {
+                    "answer": NO_CONTEXT_ANSWER,
+                    "sources": sources,
+                    "mode": "extractive",
+                    "confidence": None,
+                    "tier": tier
+                }
+
+        history = render_history(session_id)
+
+        answer = _generate_answer(question, context, history)
+        record_turn(session_id, question, answer)
+
         return {
             "answer": answer,
-            "sources": list(sources_map.values())
+            "sources": sources,
+            "mode": "generative",
+            "confidence": None,
+            "tier": tier
         }
-        
+
     except Exception as e:
         logger.error(f"Error in RAG query: {str(e)}")
         return {
             "answer": f"An error occurred while processing your question: {str(e)}",
-            "sources": []
+            "sources": [],
+            "mode": mode,
+            "confidence": None,
+            "tier": None
+        }
+
+
+def query_rag_batch(session_id: str, questions: List[str], arxiv_ids: List[str]) -> dict:
+    logger.info(f"Processing batch of {len(questions)} RAG queries for session {session_id}")
+    started = time.perf_counter()
+
+    embedder = get_embedder()
+    question_embeddings = embedder.encode(questions, normalize_embeddings=True, convert_to_numpy=True)
+    embedded = time.perf_counter()
+
+    all_matches = query_chunks_many(question_embeddings, top_k=5, arxiv_ids=arxiv_ids)
+    retrieved = time.perf_counter()
+
+    # Batch questions are independent of each other and of the chat, so they
+    # neither read nor extend the session's conversation memory.
+    def answer(question: str, matches: List[Dict]) -> dict:
+        generation_started = time.perf_counter()
+        try:
+            if not matches:
+                result = {"question": question, "answer": NO_CONTEXT_ANSWER, "sources": [], "tier": None, "error": None}
+            else:
+                context, sources = _context_and_sources(matches)
+                result = {
+                    "question": question,
+                    "answer": _generate_answer(question, context, ""),
+                    "sources": sources,
+                    "tier": _answering_tier(matches),
+                    "error": None
+                }
+        except Exception as e:
+            logger.error(f"Error answering batch question: {str(e)}")
+            result = {
+                "question": question,
+                "answer": "An error occurred while processing your question.",
+                "sources": [],
+                "tier": None,
+                "error": str(e)
+            }
+        result["timings"] = {"generate_seconds": round(time.perf_counter() - generation_started, 4)}
+        return result
+
+    with ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY) as pool:
+        results = list(pool.map(answer, questions, all_matches))
+
+    return {
+        "results": results,
+        "timings": {
+            "embed_seconds": round(embedded - started, 4),
+            "retrieve_seconds": round(retrieved - embedded, 4),
+            "generate_seconds": round(time.perf_counter() - retrieved, 4),
+            "total_seconds": round(time.perf_counter() - started, 4)
         }
+    }
@@ -1,6 +1,5 @@
 import logging
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from models import GraphState
 from dotenv import load_dotenv
 
@@ -18,6 +17,8 @@ def validate_topic(state: GraphState) -> GraphState:
 
         # return state
 
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
         gemini_api_key = os.getenv("GEMINI_API_KEY")
         if not gemini_api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
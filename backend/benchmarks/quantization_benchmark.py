@@ -0,0 +1,112 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunk_store import ChunkStore
+from vector_store import EMBEDDING_DIMENSION, QUANTIZATIONS, LocalVectorStore
+
+WORDS = (
+    "model attention transformer layer training data loss gradient token "
+    "embedding retrieval benchmark accuracy dataset parameter inference "
+    "language vision agent policy reward network architecture results"
+).split()
+
+
+def synthetic_embeddings(count: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    # Sentence embeddings are anisotropic: chunks of one paper sit close together.
+    centers = rng.normal(size=(clusters, EMBEDDING_DIMENSION)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=count)
+    vectors = centers[assignment] + 0.6 * rng.normal(size=(count, EMBEDDING_DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_texts(count: int, rng: np.random.Generator):
+    return [" ".join(rng.choice(WORDS, size=350)) for _ in range(count)]
+
+
+def traced_bytes(build) -> int:
+    # Both sides are measured the same way: bytes still allocated once
+    # `build` returns, with its result kept alive. numpy arrays report their
+    # buffers to tracemalloc, so this covers arrays and Python objects alike.
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return allocated
+
+
+def current_payload(ids, embeddings: np.ndarray, metadatas, texts):
+    # What build_rag_system used to hold per chunk: a list of Python floats
+    # from .tolist() plus up to 900 characters of text in the metadata.
+    return [
+        {"id": vector_id, "values": embedding.tolist(), "metadata": {**metadata, "text": text[:900]}}
+        for vector_id, embedding, metadata, text in zip(ids, embeddings, metadatas, texts)
+    ]
+
+
+def recall_at_k(found, expected, k: int) -> float:
+    return float(np.mean([len(set(f[:k]) & set(e[:k])) / k for f, e in zip(found, expected)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per 10k chunks and recall@5 of quantized embedding storage")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--oversample", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    embeddings = synthetic_embeddings(args.chunks, args.clusters, rng)
+    texts = synthetic_texts(args.chunks, rng)
+    ids = [f"paper{i // 50}_{i % 50}" for i in range(args.chunks)]
+    metadatas = [{"arxiv_id": f"paper{i // 50}", "chunk_index": i % 50} for i in range(args.chunks)]
+
+    queries = embeddings[rng.integers(0, args.chunks, size=args.queries)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32)
+    exact_scores = queries @ embeddings.T
+    expected = [[ids[i] for i in np.argsort(-row)[:5]] for row in exact_scores]
+
+    scale = 10000 / args.chunks
+    print(f"{args.chunks} chunks, {args.queries} queries, oversample x{args.oversample}")
+    current = traced_bytes(lambda: current_payload(ids, embeddings, metadatas, texts))
+    print(f"current float payload + inline text: {current * scale / 2**20:8.1f} MiB / 10k chunks")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chunk_store = ChunkStore(os.path.join(tmp, "chunks.bin"))
+        chunk_store.put_many(list(zip(ids, texts)))
+        print(f"compressed chunk text on disk:       {chunk_store.stored_bytes() * scale / 2**20:8.1f} MiB / 10k chunks")
+
+        for quantization in QUANTIZATIONS:
+            LocalVectorStore(os.path.join(tmp, quantization), quantization, args.oversample).upsert(
+                ids, embeddings, metadatas
+            )
+            # Resident size of a store reopened from disk: in-RAM codes plus
+            # ids, metadata and lookup tables. The float32 originals stay in
+            # the memory-mapped file.
+            resident = traced_bytes(lambda: LocalVectorStore(os.path.join(tmp, quantization), quantization, args.oversample))
+            store = LocalVectorStore(os.path.join(tmp, quantization), quantization, args.oversample)
+
+            start = time.perf_counter()
+            found = [[m["id"] for m in store.query(q, top_k=5)] for q in queries]
+            elapsed = (time.perf_counter() - start) / args.queries
+
+            print(
+                f"{quantization:>8}: {resident * scale / 2**20:6.2f} MiB resident / 10k chunks, "
+                f"recall@5 {recall_at_k(found, expected, 5):.3f}, {elapsed * 1000:.2f} ms/query"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_seconds() -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "WARMUP_ON_STARTUP": "false"}
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def status_of(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def time_to_health(ready: bool, timeout: float) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    result = {"healthy_seconds": None, "ready_seconds": None}
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if result["healthy_seconds"] is None and status_of(f"http://127.0.0.1:{port}/health") == 200:
+                    result["healthy_seconds"] = time.perf_counter() - started
+                    if not ready:
+                        break
+                if ready and status_of(f"http://127.0.0.1:{port}/health/ready") == 200:
+                    result["ready_seconds"] = time.perf_counter() - started
+                    break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
+
+def summarize(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {"median": round(statistics.median(values), 3), "max": round(max(values), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time of main and time until /health (and /health/ready) answer 200")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready", action="store_true", help="also wait for every subsystem to be warm")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    health = [time_to_health(args.ready, args.timeout) for _ in range(args.runs)]
+
+    print(json.dumps({
+        "import_main_seconds": summarize(imports),
+        "time_to_healthy_seconds": summarize([h["healthy_seconds"] for h in health]),
+        "time_to_ready_seconds": summarize([h["ready_seconds"] for h in health]) if args.ready else None
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterable, List, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<HI")
+_TOMBSTONE = 0xFFFFFFFF
+COMPACT_DEAD_FRACTION = float(os.getenv("COMPACT_DEAD_FRACTION", "0.3"))
+COMPACT_MIN_BYTES = int(os.getenv("CHUNK_COMPACT_MIN_BYTES", str(1 << 20)))
+
+_chunk_store = None
+
+
+def _record_bytes(chunk_id: str, text_len: int) -> int:
+    return _HEADER.size + len(chunk_id.encode("utf-8")) + text_len
+
+
+# Append-only file of zlib-compressed chunk texts addressed by chunk ID. Each
+# record is <id length><text length><id><compressed text>; a text length of
+# 0xFFFFFFFF marks a deletion. Only the offset table is kept in memory, texts
+# are read through a memory map on demand. Once overwritten and deleted
+# records pass COMPACT_DEAD_FRACTION of the file it is rewritten in place.
+class ChunkStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._mmap = None
+        self._mapped_size = 0
+        self._size = 0
+        self._live_bytes = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            self._scan()
+
+    def _scan(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + _HEADER.size <= len(data):
+            id_len, text_len = _HEADER.unpack_from(data, pos)
+            id_start = pos + _HEADER.size
+            text_start = id_start + id_len
+            end = text_start + (0 if text_len == _TOMBSTONE else text_len)
+            if end > len(data):
+                break
+            chunk_id = data[id_start:text_start].decode("utf-8")
+            if text_len == _TOMBSTONE:
+                self._offsets.pop(chunk_id, None)
+            else:
+                self._offsets[chunk_id] = (text_start, text_len)
+            pos = end
+        # A record cut short by a crash would misplace every later append.
+        if pos < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(pos)
+        self._size = pos
+        self._live_bytes = sum(_record_bytes(c, length) for c, (_, length) in self._offsets.items())
+        logger.info(f"Loaded {len(self._offsets)} chunk texts from {self.path}")
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._size >= COMPACT_MIN_BYTES and self._size - self._live_bytes > COMPACT_DEAD_FRACTION * self._size:
+            self._compact()
+
+    def _compact(self):
+        tmp_path = f"{self.path}.tmp"
+        offsets = {}
+        pos = 0
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            for chunk_id, (offset, length) in sorted(self._offsets.items(), key=lambda item: item[1][0]):
+                src.seek(offset)
+                encoded_id = chunk_id.encode("utf-8")
+                dst.write(_HEADER.pack(len(encoded_id), length) + encoded_id + src.read(length))
+                offsets[chunk_id] = (pos + _HEADER.size + len(encoded_id), length)
+                pos += _record_bytes(chunk_id, length)
+        os.replace(tmp_path, self.path)
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._mapped_size = 0
+        self._offsets = offsets
+        self._size = pos
+        self._live_bytes = pos
+        logger.info(f"Compacted chunk text store to {len(offsets)} texts")
+
+    def _append(self, records: Iterable[Tuple[str, bytes, int]]):
+        buffer = bytearray()
+        placed = []
+        for chunk_id, payload, text_len in records:
+            encoded_id = chunk_id.encode("utf-8")
+            buffer += _HEADER.pack(len(encoded_id), text_len)
+            buffer += encoded_id
+            placed.append((chunk_id, self._size + len(buffer), len(payload)))
+            buffer += payload
+        with open(self.path, "ab") as f:
+            f.write(buffer)
+        self._size += len(buffer)
+        return placed
+
+    def put_many(self, items: List[Tuple[str, str]]):
+        records = []
+        for chunk_id, text in items:
+            payload = zlib.compress(text.encode("utf-8"), 6)
+            records.append((chunk_id, payload, len(payload)))
+        with self._lock:
+            for chunk_id, offset, length in self._append(records):
+                previous = self._offsets.get(chunk_id)
+                if previous is not None:
+                    self._live_bytes -= _record_bytes(chunk_id, previous[1])
+                self._offsets[chunk_id] = (offset, length)
+                self._live_bytes += _record_bytes(chunk_id, length)
+            self._maybe_compact()
+
+    def delete_many(self, chunk_ids: Iterable[str]):
+        with self._lock:
+            present = [c for c in chunk_ids if c in self._offsets]
+            if not present:
+                return
+            self._append((c, b"", _TOMBSTONE) for c in present)
+            for chunk_id in present:
+                self._live_bytes -= _record_bytes(chunk_id, self._offsets.pop(chunk_id)[1])
+            self._maybe_compact()
+
+    def has_all(self, chunk_ids: Iterable[str]) -> bool:
+        with self._lock:
+            return all(chunk_id in self._offsets for chunk_id in chunk_ids)
+
+    def get_many(self, chunk_ids: Iterable[str]) -> Dict[str, str]:
+        texts = {}
+        with self._lock:
+            if self._size and self._mapped_size != self._size:
+                if self._mmap is not None:
+                    self._mmap.close()
+                with open(self.path, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._mapped_size = self._size
+            for chunk_id in chunk_ids:
+                location = self._offsets.get(chunk_id)
+                if location is None:
+                    continue
+                offset, length = location
+                texts[chunk_id] = zlib.decompress(self._mmap[offset:offset + length]).decode("utf-8")
+        return texts
+
+    def stored_bytes(self) -> int:
+        return sum(length for _, length in self._offsets.values())
+
+
+def get_chunk_store() -> ChunkStore:
+    global _chunk_store
+    if _chunk_store is None:
+        _chunk_store = ChunkStore(os.path.join(os.getenv("DATA_DIR", "data"), "chunks.bin"))
+    return _chunk_store
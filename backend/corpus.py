@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from vector_store import CHUNK_TEXT_STORE, abstract_id, chunk_id, delete_chunks, fetch_chunk_metadata
+from chunk_store import get_chunk_store
+from sentence_store import get_sentence_store
+
+logger = logging.getLogger(__name__)
+
+# Pinecone deletes are eventually consistent, so a paper deleted this recently
+# may still show up in a metadata fetch and must not count as indexed.
+GC_CONSISTENCY_SECONDS = float(os.getenv("GC_CONSISTENCY_SECONDS", "60"))
+
+_lock = threading.Condition()
+_session_papers: Dict[str, Set[str]] = {}
+_paper_sessions: Dict[str, Set[str]] = {}
+_paper_chunks: Dict[str, int] = {}
+_full_text_errors: Dict[str, str] = {}
+_deleting: Dict[str, int] = {}
+_deleted_at: Dict[str, float] = {}
+
+
+def acquire_papers(session_id: str, arxiv_ids: Iterable[str]):
+    with _lock:
+        papers = _session_papers.setdefault(session_id, set())
+        for arxiv_id in arxiv_ids:
+            papers.add(arxiv_id)
+            _paper_sessions.setdefault(arxiv_id, set()).add(session_id)
+
+
+def release_session(session_id: str) -> List[str]:
+    with _lock:
+        orphaned = []
+        for arxiv_id in _session_papers.pop(session_id, set()):
+            holders = _paper_sessions.get(arxiv_id)
+            if holders is None:
+                continue
+            holders.discard(session_id)
+            if not holders:
+                del _paper_sessions[arxiv_id]
+                orphaned.append(arxiv_id)
+        chunk_counts = {arxiv_id: _paper_chunks.pop(arxiv_id, 0) for arxiv_id in orphaned}
+        for arxiv_id in orphaned:
+            _full_text_errors.pop(arxiv_id, None)
+            _deleting[arxiv_id] = _deleting.get(arxiv_id, 0) + 1
+
+    # A paper whose full text never landed still has its tier-0 abstract vector.
+    ids = [
+        chunk_id(arxiv_id, i)
+        for arxiv_id, count in chunk_counts.items()
+        for i in range(count)
+    ] + [abstract_id(arxiv_id) for arxiv_id in orphaned]
+    if ids:
+        try:
+            delete_chunks(ids)
+            for arxiv_id in orphaned:
+                get_sentence_store().delete(arxiv_id)
+            logger.info(f"Garbage-collected {len(orphaned)} papers ({len(ids)} chunks) released by session {session_id}")
+        except Exception as e:
+            logger.error(f"Error deleting vectors for released papers: {str(e)}")
+        finally:
+            with _lock:
+                now = time.time()
+                for arxiv_id in orphaned:
+                    _deleting[arxiv_id] -= 1
+                    if not _deleting[arxiv_id]:
+                        del _deleting[arxiv_id]
+                    _deleted_at[arxiv_id] = now
+                    # Anything indexed while the delete ran may have lost its
+                    # vectors to it; a session holding the paper re-indexes it.
+                    _paper_chunks.pop(arxiv_id, None)
+                _lock.notify_all()
+    return orphaned
+
+
+def mark_indexed(arxiv_id: str, chunk_count: int):
+    with _lock:
+        _paper_chunks[arxiv_id] = chunk_count
+        _full_text_errors.pop(arxiv_id, None)
+
+
+def mark_full_text_failed(arxiv_id: str, error: Optional[str]):
+    # The paper keeps answering from its abstract; a later session that needs
+    # it finds it unindexed and tries the full text again. None clears it.
+    with _lock:
+        if error is None:
+            _full_text_errors.pop(arxiv_id, None)
+        else:
+            _full_text_errors[arxiv_id] = error
+
+
+def full_text_errors(arxiv_ids: List[str]) -> Dict[str, str]:
+    with _lock:
+        return {a: _full_text_errors[a] for a in arxiv_ids if a in _full_text_errors}
+
+
+def unindexed_papers(arxiv_ids: List[str]) -> List[str]:
+    with _lock:
+        # Re-indexing a paper while its garbage collection is still deleting
+        # would let the delete remove the new vectors, so wait it out.
+        _lock.wait_for(lambda: not any(a in _deleting for a in arxiv_ids))
+        missing = [a for a in arxiv_ids if a not in _paper_chunks]
+        cutoff = time.time() - GC_CONSISTENCY_SECONDS
+        for arxiv_id in [a for a, at in _deleted_at.items() if at < cutoff]:
+            del _deleted_at[arxiv_id]
+        recently_deleted = {a for a in missing if a in _deleted_at}
+    if not missing:
+        return []
+
+    # Papers indexed by an earlier process are still in the shared namespace;
+    # the first chunk of each paper records how many chunks it was split into.
+    # With texts kept locally, a node whose DATA_DIR lacks them (a new replica,
+    # a wiped volume) re-indexes the paper rather than answer from no context.
+    fetched = fetch_chunk_metadata([chunk_id(a, 0) for a in missing if a not in recently_deleted])
+    for metadata in fetched.values():
+        count = int(metadata.get("chunk_count") or 0)
+        if not count:
+            continue
+        if CHUNK_TEXT_STORE == "local" and not get_chunk_store().has_all(
+            chunk_id(metadata["arxiv_id"], i) for i in range(count)
+        ):
+            continue
+        mark_indexed(metadata["arxiv_id"], count)
+
+    with _lock:
+        return [a for a in missing if a not in _paper_chunks]
+
+
+def full_text_pending(arxiv_ids: List[str]) -> List[str]:
+    # Unlike unindexed_papers this never touches the vector store, so it is
+    # cheap enough to call on every status poll.
+    with _lock:
+        return [a for a in arxiv_ids if a not in _paper_chunks]
+
+
+def is_referenced(arxiv_id: str) -> bool:
+    with _lock:
+        return bool(_paper_sessions.get(arxiv_id))
+
+
+def session_paper_ids(session_id: str) -> List[str]:
+    with _lock:
+        return sorted(_session_papers.get(session_id, set()))
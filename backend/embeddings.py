@@ -0,0 +1,25 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+_embedder = None
+_lock = threading.Lock()
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f"Loading embedding model {EMBEDDING_MODEL}")
+                _embedder = SentenceTransformer(EMBEDDING_MODEL)
+    return _embedder
+
+
+def embedder_loaded() -> bool:
+    return _embedder is not None
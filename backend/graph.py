@@ -1,14 +1,19 @@
+import asyncio
 import logging
-from langgraph.graph import StateGraph, END
+import threading
 from models import GraphState
 from agents.validator import validate_topic
 from agents.fetcher import fetch_papers
 from agents.comprehensive_summarizer import generate_comprehensive_summary
 from agents.rag_builder import build_rag_system
+from corpus import release_session
 from utils import generate_session_id
 
 logger = logging.getLogger(__name__)
 
+_graph = None
+_graph_lock = threading.Lock()
+
 
 def should_continue_after_validation(state: GraphState) -> str:
     return "fetch_papers" if state.get("is_valid_ai_topic", False) else "end"
@@ -19,6 +24,8 @@ def should_continue_after_fetch(state: GraphState) -> str:
 
 
 def create_research_graph():
+    from langgraph.graph import StateGraph, END
+
     workflow = StateGraph(GraphState)
     
     workflow.add_node("validate_topic", validate_topic)
@@ -53,6 +60,19 @@ def create_research_graph():
     return workflow.compile()
 
 
+def get_research_graph():
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = create_research_graph()
+    return _graph
+
+
+def graph_compiled() -> bool:
+    return _graph is not None
+
+
 async def process_topic_workflow(topic: str) -> dict:
     logger.info(f"Starting workflow for topic: {topic}")
     
@@ -68,7 +88,7 @@ async def process_topic_workflow(topic: str) -> dict:
         "rag_progress": None
     }
     
-    graph = create_research_graph()
+    graph = get_research_graph()
     
     try:
         final_state = await graph.ainvoke(initial_state)
@@ -95,6 +115,9 @@ async def process_topic_workflow(topic: str) -> dict:
         }
         
     except Exception as e:
+        # rag_build may already hold corpus references for this session, and
+        # without a stored session nothing would ever release them.
+        await asyncio.to_thread(release_session, session_id)
         return {
             "is_valid_ai_topic": False,
             "comprehensive_summary": None,
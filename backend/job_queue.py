@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+INGEST_MODE = os.getenv("INGEST_MODE", "inline")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "5"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "300"))
+
+# Job lifecycle: queued -> running -> indexed (worker finished, results not yet
+# collected by the API process) -> done, or failed once retries run out.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    locked_by TEXT,
+    locked_at REAL,
+    progress TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    data BLOB,
+    collected INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, item_key)
+);
+"""
+
+_initialized = set()
+
+
+def queue_path() -> str:
+    return os.getenv("JOB_QUEUE_PATH", os.path.join(os.getenv("DATA_DIR", "data"), "jobs.db"))
+
+
+def _connect() -> sqlite3.Connection:
+    path = queue_path()
+    if path not in _initialized:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if path not in _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized.add(path)
+    return conn
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def enqueue(job_id: str, kind: str, payload: Dict, max_attempts: int = JOB_MAX_ATTEMPTS) -> Dict:
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT OR IGNORE INTO jobs (id, kind, payload, status, max_attempts, next_attempt_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), max_attempts, now, now, now)
+        )
+        return _row_to_job(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def claim(worker_id: str, kinds: List[str]) -> Optional[Dict]:
+    now = time.time()
+    placeholders = ",".join("?" for _ in kinds)
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A running job whose lease expired belongs to a worker that died.
+            rows = conn.execute(
+                f"SELECT * FROM jobs WHERE kind IN ({placeholders}) AND "
+                "((status = 'queued' AND next_attempt_at <= ?) OR (status = 'running' AND locked_at < ?)) "
+                "ORDER BY created_at",
+                (*kinds, now, now - JOB_LEASE_SECONDS)
+            ).fetchall()
+            for row in rows:
+                if row["attempts"] >= row["max_attempts"]:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                        (row["error"] or "Worker lease expired", now, row["id"])
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?, "
+                    "locked_at = ?, updated_at = ? WHERE id = ?",
+                    (worker_id, now, now, row["id"])
+                )
+                conn.execute("COMMIT")
+                return _row_to_job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+            conn.execute("COMMIT")
+            return None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def heartbeat(job_id: str, progress: Optional[str] = None):
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET locked_at = ?, progress = COALESCE(?, progress), updated_at = ? WHERE id = ?",
+            (now, progress, now, job_id)
+        )
+    finally:
+        conn.close()
+
+
+def complete(job_id: str, status: str = "indexed"):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, locked_by = NULL, error = NULL, updated_at = ? WHERE id = ?",
+            (status, time.time(), job_id)
+        )
+    finally:
+        conn.close()
+
+
+def fail(job_id: str, error: str):
+    now = time.time()
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        if row["attempts"] >= row["max_attempts"]:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', locked_by = NULL, error = ?, updated_at = ? WHERE id = ?",
+                (error, now, job_id)
+            )
+            logger.error(f"Job {job_id} failed after {row['attempts']} attempts: {error}")
+            return
+        delay = min(JOB_BACKOFF_SECONDS * 2 ** (row["attempts"] - 1), JOB_BACKOFF_MAX_SECONDS)
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', locked_by = NULL, error = ?, next_attempt_at = ?, updated_at = ? "
+            "WHERE id = ?",
+            (error, now + delay, now, job_id)
+        )
+        logger.warning(f"Job {job_id} attempt {row['attempts']} failed, retrying in {delay:.0f}s: {error}")
+    finally:
+        conn.close()
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+    finally:
+        conn.close()
+
+
+def publish_result(job_id: str, item_key: str, payload: Dict, data: Optional[bytes] = None):
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO job_results (job_id, item_key, payload, data, collected) VALUES (?, ?, ?, ?, 0)",
+            (job_id, item_key, json.dumps(payload), data)
+        )
+    finally:
+        conn.close()
+
+
+def published_keys(job_id: str) -> List[str]:
+    conn = _connect()
+    try:
+        return [row["item_key"] for row in conn.execute(
+            "SELECT item_key FROM job_results WHERE job_id = ?", (job_id,)
+        )]
+    finally:
+        conn.close()
+
+
+def uncollected_results(limit: int = 20) -> List[Dict]:
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM job_results WHERE collected = 0 ORDER BY rowid LIMIT ?", (limit,)
+        ).fetchall()
+        return [{**dict(row), "payload": json.loads(row["payload"])} for row in rows]
+    finally:
+        conn.close()
+
+
+def mark_collected(job_id: str, item_key: str):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE job_results SET collected = 1, data = NULL WHERE job_id = ? AND item_key = ?",
+            (job_id, item_key)
+        )
+    finally:
+        conn.close()
+
+
+def finish_collected_jobs() -> List[str]:
+    # Jobs the workers have finished move to done once every published result
+    # has been collected by the API process.
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'indexed' AND NOT EXISTS "
+                "(SELECT 1 FROM job_results r WHERE r.job_id = jobs.id AND r.collected = 0)"
+            ).fetchall()
+            now = time.time()
+            for row in rows:
+                conn.execute("UPDATE jobs SET status = 'done', updated_at = ? WHERE id = ?", (now, row["id"]))
+                conn.execute("DELETE FROM job_results WHERE job_id = ?", (row["id"],))
+            conn.execute("COMMIT")
+            return [row["id"] for row in rows]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
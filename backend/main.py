@@ -1,15 +1,38 @@
+import hashlib
+import io
 import logging
-from fastapi import FastAPI, HTTPException
+import os
+from typing import List
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from models import (
     ProcessTopicRequest, 
     ProcessTopicResponse,
     QueryRAGRequest,
-    QueryRAGResponse
+    QueryRAGResponse,
+    QueryRAGBatchRequest,
+    QueryRAGBatchResponse,
+    JobStatusResponse,
+    SessionResponse,
+    SnapshotInfo
 )
 from graph import process_topic_workflow
-from agents.rag_query import query_rag
-from utils import store_session, get_session, cleanup_expired_sessions
+from agents.rag_query import query_rag, query_rag_batch
+from admission import admission, AdmissionRejected
+from compression import CompressionMiddleware
+from corpus import release_session, full_text_pending, full_text_errors
+from memory import forget_session, memory_stats
+import job_queue
+from worker import start_worker_pool, stop_worker_pool, start_result_collector, stop_result_collector, INGEST_WORKERS
+from warmup import start_background_warmup, readiness
+from prewarm import (
+    PREWARM_ENABLED, SNAPSHOT_SERVE, record_request, latest_snapshot, clone_snapshot, list_snapshots,
+    export_snapshots, start_prewarm_scheduler, stop_prewarm_scheduler
+)
+from utils import store_session, get_session, cleanup_expired_sessions, on_session_expired, generate_session_id
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,26 +43,63 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="AI Research Paper Multi-Agent System",
     description="Multi-agent system for researching AI topics using RAG",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+on_session_expired(release_session)
+on_session_expired(forget_session)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After"],
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
 )
 
 
+def client_id(request: Request) -> str:
+    if os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true":
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting AI Research Paper Multi-Agent System")
+    start_background_warmup()
+    if job_queue.INGEST_MODE == "queue":
+        start_result_collector()
+        if INGEST_WORKERS > 0:
+            start_worker_pool(INGEST_WORKERS)
+    if PREWARM_ENABLED:
+        start_prewarm_scheduler()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down AI Research Paper Multi-Agent System")
+    stop_result_collector()
+    stop_worker_pool()
+    stop_prewarm_scheduler()
 
 
 @app.get("/")
@@ -55,20 +115,174 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/ready")
+async def readiness_check():
+    report = readiness()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
+@app.get("/metrics")
+async def metrics():
+    return {"admission": admission.metrics(), "conversation_memory": memory_stats()}
+
+
+@app.get("/api/snapshots", response_model=List[SnapshotInfo])
+async def snapshots():
+    return await run_in_threadpool(list_snapshots)
+
+
+@app.get("/api/snapshots/export")
+async def snapshots_export():
+    buffer = io.BytesIO()
+    await run_in_threadpool(export_snapshots, buffer)
+    return Response(
+        content=buffer.getvalue(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="snapshots.zip"'}
+    )
+
+
+def refresh_rag_state(session_id: str, session_data: dict) -> dict:
+    # Sessions are queryable on abstracts from the start; this tracks how far
+    # the full-text tier has got.
+    if session_data.get("rag_progress") == "ready" or not session_data.get("rag_ready"):
+        return session_data
+    paper_ids = session_data.get("paper_ids", [])
+    pending = full_text_pending(paper_ids)
+    if not pending:
+        session_data["rag_progress"] = "ready"
+        return session_data
+    job = job_queue.get_job(session_id) if job_queue.INGEST_MODE == "queue" else None
+    errors = full_text_errors(pending)
+    if job is not None and job["status"] == "failed":
+        session_data["rag_progress"] = f"abstracts only, full text failed: {job['error']}"
+    elif len(errors) == len(pending):
+        # Nothing is still running, so report the failures rather than progress.
+        session_data["rag_progress"] = (
+            f"full text failed for {len(errors)}/{len(paper_ids)} papers, answering from abstracts: "
+            f"{next(iter(errors.values()))}"
+        )
+    else:
+        session_data["rag_progress"] = f"abstracts indexed, full text {len(paper_ids) - len(pending)}/{len(paper_ids)}"
+    return session_data
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def job_status(job_id: str):
+    job = await run_in_threadpool(job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    session_data = get_session(job_id)
+    if session_data:
+        refresh_rag_state(job_id, session_data)
+    
+    return JobStatusResponse(
+        job_id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        attempts=job["attempts"],
+        max_attempts=job["max_attempts"],
+        progress=job["progress"],
+        error=job["error"],
+        rag_ready=bool(session_data and session_data.get("rag_ready"))
+    )
+
+
+@app.get("/api/sessions/{session_id}", response_model=SessionResponse)
+async def get_session_endpoint(session_id: str, request: Request):
+    session_data = get_session(session_id)
+    if not session_data:
+        raise HTTPException(
+            status_code=404,
+            detail="Session not found or expired. Please process the topic again."
+        )
+    
+    refresh_rag_state(session_id, session_data)
+    session = SessionResponse(
+        session_id=session_id,
+        topic=session_data["topic"],
+        comprehensive_summary=session_data.get("comprehensive_summary"),
+        papers=session_data.get("papers", []),
+        rag_ready=session_data.get("rag_ready", False),
+        rag_progress=session_data.get("rag_progress")
+    )
+    body = orjson.dumps(session.model_dump())
+    # Weak, because CompressionMiddleware serves the same tag for the gzip, br
+    # and identity bodies, which are different representations byte for byte.
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": f"W/{etag}", "Cache-Control": "private, no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.post("/api/process-topic", response_model=ProcessTopicResponse)
-async def process_topic(request: ProcessTopicRequest):
+async def process_topic(request: ProcessTopicRequest, http_request: Request):
     logger.info(f"Received request to process topic: {request.topic}")
     
     cleanup_expired_sessions()
+    # The demand log only feeds the prewarm scheduler, which also trims it.
+    if PREWARM_ENABLED:
+        await run_in_threadpool(record_request, request.topic)
     
+    # Snapshot hits only copy precomputed results into a new session, so they
+    # skip the ingest queue.
+    if SNAPSHOT_SERVE:
+        snapshot = await run_in_threadpool(latest_snapshot, request.topic)
+        if snapshot is not None:
+            try:
+                return await _serve_snapshot(request, snapshot)
+            except Exception as e:
+                logger.error(f"Error serving snapshot for '{request.topic}', running the workflow: {str(e)}")
+    
+    async with admission.admit("ingest", client_id(http_request)):
+        return await _process_topic(request)
+
+
+async def _serve_snapshot(request: ProcessTopicRequest, snapshot: dict) -> ProcessTopicResponse:
+    if not snapshot["is_valid_ai_topic"]:
+        return ProcessTopicResponse(
+            is_valid_ai_topic=False,
+            error=snapshot.get("error"),
+            snapshot_version=snapshot["version"]
+        )
+    
+    session_id = generate_session_id()
+    try:
+        session_data = await run_in_threadpool(clone_snapshot, snapshot, session_id)
+    except Exception:
+        await run_in_threadpool(release_session, session_id)
+        raise
+    store_session(session_id, {"topic": request.topic, **session_data})
+    logger.info(f"Served topic '{request.topic}' from snapshot v{snapshot['version']} as session {session_id}")
+    
+    return ProcessTopicResponse(
+        is_valid_ai_topic=True,
+        comprehensive_summary=session_data["comprehensive_summary"],
+        papers=session_data["papers"],
+        session_id=session_id,
+        rag_ready=session_data["rag_ready"],
+        rag_progress=session_data["rag_progress"],
+        snapshot_version=snapshot["version"]
+    )
+
+
+async def _process_topic(request: ProcessTopicRequest) -> ProcessTopicResponse:
     try:
         result = await process_topic_workflow(topic=request.topic)
         
         if result.get("is_valid_ai_topic") and result.get("session_id"):
             store_session(result["session_id"], {
                 "topic": request.topic,
+                "comprehensive_summary": result.get("comprehensive_summary"),
                 "papers": result.get("papers", []),
-                "rag_ready": result.get("rag_ready", False)
+                "paper_ids": [paper["arxiv_id"] for paper in result.get("papers", [])],
+                "rag_ready": result.get("rag_ready", False),
+                "rag_progress": result.get("rag_progress")
             })
         
         return ProcessTopicResponse(
@@ -90,9 +304,14 @@ async def process_topic(request: ProcessTopicRequest):
 
 
 @app.post("/api/query-rag", response_model=QueryRAGResponse)
-async def query_rag_endpoint(request: QueryRAGRequest):
+async def query_rag_endpoint(request: QueryRAGRequest, http_request: Request):
     logger.info(f"Received RAG query for session {request.session_id}: {request.question[:50]}...")
     
+    async with admission.admit("query", client_id(http_request)):
+        return await _query_rag(request)
+
+
+async def _query_rag(request: QueryRAGRequest) -> QueryRAGResponse:
     try:
         session_data = get_session(request.session_id)
         if not session_data:
@@ -101,6 +320,7 @@ async def query_rag_endpoint(request: QueryRAGRequest):
                 detail="Session not found or expired. Please process the topic again."
             )
         
+        refresh_rag_state(request.session_id, session_data)
         if not session_data.get("rag_ready", False):
             return QueryRAGResponse(
                 answer="The RAG system is not ready yet. Please wait a moment and try again.",
@@ -108,14 +328,20 @@ async def query_rag_endpoint(request: QueryRAGRequest):
                 error="RAG system not ready"
             )
         
-        result = query_rag(
+        result = await run_in_threadpool(
+            query_rag,
             session_id=request.session_id,
-            question=request.question
+            question=request.question,
+            arxiv_ids=session_data.get("paper_ids", []),
+            mode=request.mode
         )
         
         return QueryRAGResponse(
             answer=result.get("answer", ""),
             sources=result.get("sources", []),
+            mode=result.get("mode", request.mode),
+            confidence=result.get("confidence"),
+            tier=result.get("tier"),
             error=None
         )
         
@@ -130,6 +356,48 @@ async def query_rag_endpoint(request: QueryRAGRequest):
         )
 
 
+
+@app.post("/api/query-rag/batch", response_model=QueryRAGBatchResponse)
+async def query_rag_batch_endpoint(request: QueryRAGBatchRequest, http_request: Request):
+    logger.info(f"Received batch of {len(request.questions)} RAG queries for session {request.session_id}")
+    
+    async with admission.admit("query", client_id(http_request)):
+        return await _query_rag_batch(request)
+
+
+async def _query_rag_batch(request: QueryRAGBatchRequest) -> QueryRAGBatchResponse:
+    try:
+        session_data = get_session(request.session_id)
+        if not session_data:
+            raise HTTPException(
+                status_code=404,
+                detail="Session not found or expired. Please process the topic again."
+            )
+        
+        refresh_rag_state(request.session_id, session_data)
+        if not session_data.get("rag_ready", False):
+            return QueryRAGBatchResponse(error="RAG system not ready")
+        
+        result = await run_in_threadpool(
+            query_rag_batch,
+            session_id=request.session_id,
+            questions=request.questions,
+            arxiv_ids=session_data.get("paper_ids", [])
+        )
+        
+        return QueryRAGBatchResponse(
+            results=result.get("results", []),
+            timings=result.get("timings", {}),
+            error=None
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error querying RAG batch: {str(e)}")
+        return QueryRAGBatchResponse(error=str(e))
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,124 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "3"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "600"))
+MEMORY_GLOBAL_TOKEN_LIMIT = int(os.getenv("MEMORY_GLOBAL_TOKEN_LIMIT", "500000"))
+
+_lock = threading.RLock()
+_memories: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+_total_tokens = 0
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1 if text else 0
+
+
+def first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = re.split(r"(?<=[.!?])\s+", text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "..."
+
+
+# Keeps the last few turns verbatim and folds older ones into a running
+# summary of one line per turn, so the rendered history stays within a fixed
+# token budget however long the conversation runs.
+class ConversationMemory:
+    def __init__(self, max_turns: int = MEMORY_MAX_TURNS, token_budget: int = MEMORY_TOKEN_BUDGET):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.turns: Deque[Tuple[str, str]] = deque()
+        self.summary: Deque[str] = deque()
+        self.tokens = 0
+
+    def _fold_oldest_turn(self):
+        question, answer = self.turns.popleft()
+        self.summary.append(f"- Asked: {first_sentence(question)} Answered: {first_sentence(answer)}")
+
+    def _recount(self) -> int:
+        return estimate_tokens(self.render())
+
+    def add_turn(self, question: str, answer: str):
+        max_chars = self.token_budget * 2
+        self.turns.append((question[:max_chars], answer[:max_chars]))
+        while len(self.turns) > self.max_turns:
+            self._fold_oldest_turn()
+
+        self.tokens = self._recount()
+        while self.tokens > self.token_budget and (self.summary or len(self.turns) > 1):
+            if len(self.turns) > 1:
+                self._fold_oldest_turn()
+            else:
+                self.summary.popleft()
+            self.tokens = self._recount()
+
+    def render(self) -> str:
+        parts = []
+        if self.summary:
+            parts.append("Summary of earlier conversation:\n" + "\n".join(self.summary))
+        for question, answer in self.turns:
+            parts.append(f"Q: {question}\nA: {answer}")
+        return "\n\n".join(parts)
+
+
+def get_memory(session_id: str) -> ConversationMemory:
+    with _lock:
+        memory = _memories.get(session_id)
+        if memory is None:
+            memory = ConversationMemory()
+            _memories[session_id] = memory
+        _memories.move_to_end(session_id)
+        return memory
+
+
+def render_history(session_id: str) -> str:
+    # record_turn mutates the deques from other threads, so rendering has to
+    # happen under the same lock.
+    with _lock:
+        memory = _memories.get(session_id)
+        if memory is None:
+            return ""
+        _memories.move_to_end(session_id)
+        return memory.render()
+
+
+def record_turn(session_id: str, question: str, answer: str):
+    global _total_tokens
+    with _lock:
+        memory = get_memory(session_id)
+        before = memory.tokens
+        memory.add_turn(question, answer)
+        _total_tokens += memory.tokens - before
+
+        # Over the global limit the least recently used conversations lose
+        # their history first; the active one is evicted last.
+        for victim_id in list(_memories):
+            if _total_tokens <= MEMORY_GLOBAL_TOKEN_LIMIT or victim_id == session_id:
+                break
+            victim = _memories.pop(victim_id)
+            _total_tokens -= victim.tokens
+            logger.info(f"Evicted conversation memory for session {victim_id} ({victim.tokens} tokens)")
+
+
+def forget_session(session_id: str):
+    global _total_tokens
+    with _lock:
+        memory = _memories.pop(session_id, None)
+        if memory is not None:
+            _total_tokens -= memory.tokens
+
+
+def memory_stats() -> dict:
+    with _lock:
+        return {
+            "sessions": len(_memories),
+            "tokens": _total_tokens,
+            "token_limit": MEMORY_GLOBAL_TOKEN_LIMIT
+        }
@@ -1,4 +1,4 @@
-from typing import TypedDict, List, Dict, Optional, Annotated
+from typing import TypedDict, List, Dict, Optional, Annotated, Literal
 from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
 from operator import add
@@ -61,11 +61,16 @@ class ProcessTopicResponse(BaseModel):
     rag_ready: Optional[bool] = False
     error: Optional[str] = None
     rag_progress: Optional[str] = None
+    snapshot_version: Optional[int] = None
 
 
 class QueryRAGRequest(BaseModel):
     session_id: str = Field(..., description="Session ID from process-topic")
     question: str = Field(..., min_length=1, description="Question to ask about the papers")
+    mode: Literal["generative", "extractive", "auto"] = Field(
+        "generative",
+        description="extractive quotes the best-matching sentences without an LLM; auto falls back to generative on low confidence"
+    )
 
 
 class Source(BaseModel):
@@ -77,4 +82,59 @@ class Source(BaseModel):
 class QueryRAGResponse(BaseModel):
     answer: str
     sources: List[Source] = []
+    mode: str = "generative"
+    confidence: Optional[float] = None
+    tier: Optional[int] = None
     error: Optional[str] = None
+
+
+class SessionResponse(BaseModel):
+    session_id: str
+    topic: str
+    comprehensive_summary: Optional[ComprehensiveSummary] = None
+    papers: List[Paper] = []
+    rag_ready: bool = False
+    rag_progress: Optional[str] = None
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    progress: Optional[str] = None
+    error: Optional[str] = None
+    rag_ready: bool = False
+
+
+class QueryRAGBatchRequest(BaseModel):
+    session_id: str = Field(..., description="Session ID from process-topic")
+    questions: List[Annotated[str, Field(min_length=1)]] = Field(
+        ..., min_length=1, max_length=32, description="Questions to ask about the papers"
+    )
+
+
+class QueryRAGBatchResult(BaseModel):
+    question: str
+    answer: str
+    sources: List[Source] = []
+    tier: Optional[int] = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = {}
+
+
+class QueryRAGBatchResponse(BaseModel):
+    results: List[QueryRAGBatchResult] = []
+    timings: Dict[str, float] = {}
+    error: Optional[str] = None
+
+
+class SnapshotInfo(BaseModel):
+    key: str
+    topic: str
+    version: int
+    created_at: float
+    is_valid_ai_topic: bool
+    paper_count: int
+    stale: bool
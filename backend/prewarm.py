@@ -0,0 +1,465 @@
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import zipfile
+from collections import Counter
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from embeddings import EMBEDDING_MODEL
+from vector_store import EMBEDDING_DIMENSION
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_SERVE = os.getenv("SNAPSHOT_SERVE", "true").lower() == "true"
+SNAPSHOT_REFRESH_HOURS = float(os.getenv("SNAPSHOT_REFRESH_HOURS", "24"))
+SNAPSHOT_SERVE_HOURS = float(os.getenv("SNAPSHOT_SERVE_HOURS", "168"))
+SNAPSHOT_KEEP_VERSIONS = int(os.getenv("SNAPSHOT_KEEP_VERSIONS", "2"))
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "false").lower() == "true"
+PREWARM_TOPICS = [topic.strip() for topic in os.getenv("PREWARM_TOPICS", "").split(",") if topic.strip()]
+PREWARM_TOPICS_FILE = os.getenv("PREWARM_TOPICS_FILE", "")
+PREWARM_LEARNED_TOPICS = int(os.getenv("PREWARM_LEARNED_TOPICS", "200"))
+PREWARM_MIN_REQUESTS = int(os.getenv("PREWARM_MIN_REQUESTS", "2"))
+PREWARM_LOG_DAYS = float(os.getenv("PREWARM_LOG_DAYS", "14"))
+PREWARM_HOURS = os.getenv("PREWARM_HOURS", "1-6")
+PREWARM_INTERVAL_SECONDS = float(os.getenv("PREWARM_INTERVAL_SECONDS", "300"))
+PREWARM_BATCH = int(os.getenv("PREWARM_BATCH", "5"))
+PREWARM_RETRY_SECONDS = float(os.getenv("PREWARM_RETRY_SECONDS", "3600"))
+
+_MEMBER = re.compile(r"^([0-9a-f]{16})/v(\d+)/(manifest\.json|embeddings\.npz)$")
+
+_log_lock = threading.Lock()
+_failed_until: Dict[str, float] = {}
+_scheduler_stop = threading.Event()
+
+
+def snapshot_dir() -> str:
+    return os.path.join(os.getenv("DATA_DIR", "data"), "snapshots")
+
+
+def request_log_path() -> str:
+    return os.path.join(os.getenv("DATA_DIR", "data"), "topic_requests.jsonl")
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def topic_key(topic: str) -> str:
+    return hashlib.sha1(normalize_topic(topic).encode("utf-8")).hexdigest()[:16]
+
+
+# Topic demand
+
+def record_request(topic: str):
+    path = request_log_path()
+    line = json.dumps({"topic": normalize_topic(topic), "at": time.time()}) + "\n"
+    with _log_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def learned_topics(limit: int = PREWARM_LEARNED_TOPICS) -> List[str]:
+    # Counts requests inside the log window and rewrites the log without the
+    # entries that fell out of it, so the file stays bounded.
+    path = request_log_path()
+    cutoff = time.time() - PREWARM_LOG_DAYS * 86400
+    with _log_lock:
+        if not os.path.exists(path):
+            return []
+        recent = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("at", 0) >= cutoff and entry.get("topic"):
+                    recent.append(entry)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in recent)
+        os.replace(tmp_path, path)
+
+    counts = Counter(entry["topic"] for entry in recent)
+    return [topic for topic, count in counts.most_common(limit) if count >= PREWARM_MIN_REQUESTS]
+
+
+def configured_topics() -> List[str]:
+    topics = list(PREWARM_TOPICS)
+    if PREWARM_TOPICS_FILE and os.path.exists(PREWARM_TOPICS_FILE):
+        with open(PREWARM_TOPICS_FILE, "r", encoding="utf-8") as f:
+            topics += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return topics
+
+
+def prewarm_topics() -> List[str]:
+    # Configured topics come first, then the most requested ones.
+    topics = {}
+    for topic in configured_topics() + learned_topics():
+        topics.setdefault(topic_key(topic), topic)
+    return list(topics.values())
+
+
+# Snapshot storage: DATA_DIR/snapshots/<topic key>/v<N>/{manifest.json,embeddings.npz}
+
+def _versions(key: str) -> List[int]:
+    directory = os.path.join(snapshot_dir(), key)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[1:]) for name in os.listdir(directory) if re.fullmatch(r"v\d+", name))
+
+
+def _version_path(key: str, version: int) -> str:
+    return os.path.join(snapshot_dir(), key, f"v{version}")
+
+
+def _compatible(manifest: Dict) -> bool:
+    return (
+        manifest.get("format") == SNAPSHOT_FORMAT
+        and manifest.get("embedding_model") == EMBEDDING_MODEL
+        and manifest.get("embedding_dimension") == EMBEDDING_DIMENSION
+    )
+
+
+def load_manifest(key: str, version: Optional[int] = None) -> Optional[Dict]:
+    versions = _versions(key)
+    if not versions:
+        return None
+    version = versions[-1] if version is None else version
+    path = os.path.join(_version_path(key, version), "manifest.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if _compatible(manifest) else None
+
+
+def latest_snapshot(topic: str, max_age_hours: float = SNAPSHOT_SERVE_HOURS) -> Optional[Dict]:
+    manifest = load_manifest(topic_key(topic))
+    if manifest is None or time.time() - manifest["created_at"] > max_age_hours * 3600:
+        return None
+    return manifest
+
+
+def _write_snapshot(key: str, manifest: Dict, arrays: Dict[str, np.ndarray]) -> int:
+    directory = os.path.join(snapshot_dir(), key)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".tmp-{os.getpid()}-{threading.get_ident()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    try:
+        while True:
+            version = (_versions(key) or [0])[-1] + 1
+            manifest = {**manifest, "key": key, "version": version}
+            with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            with open(os.path.join(tmp_path, "embeddings.npz"), "wb") as f:
+                np.savez(f, **arrays)
+            # A whole version directory appears at once; another writer taking
+            # the same number makes the rename fail and we try the next one.
+            try:
+                os.rename(tmp_path, _version_path(key, version))
+                break
+            except OSError:
+                if not os.path.exists(_version_path(key, version)):
+                    raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    for old in _versions(key)[:-SNAPSHOT_KEEP_VERSIONS]:
+        shutil.rmtree(_version_path(key, old), ignore_errors=True)
+    return version
+
+
+def list_snapshots() -> List[Dict]:
+    if not os.path.isdir(snapshot_dir()):
+        return []
+    snapshots = []
+    for key in sorted(os.listdir(snapshot_dir())):
+        manifest = load_manifest(key)
+        if manifest is None:
+            continue
+        snapshots.append({
+            "key": key,
+            "topic": manifest["topic"],
+            "version": manifest["version"],
+            "created_at": manifest["created_at"],
+            "is_valid_ai_topic": manifest["is_valid_ai_topic"],
+            "paper_count": len(manifest["papers"]),
+            "stale": time.time() - manifest["created_at"] > SNAPSHOT_REFRESH_HOURS * 3600
+        })
+    return snapshots
+
+
+# Precompute
+
+def build_snapshot(topic: str) -> int:
+    from agents.validator import validate_topic
+    from agents.fetcher import fetch_papers
+    from agents.comprehensive_summarizer import generate_comprehensive_summary
+    from agents.rag_builder import embed_paper
+
+    state = {
+        "topic": topic,
+        "is_valid_ai_topic": False,
+        "papers": [],
+        "comprehensive_summary": None,
+        "session_id": None,
+        "rag_ready": False,
+        "error": None,
+        "rag_progress": None
+    }
+    state = validate_topic(state)
+
+    # Only clean results are worth replaying to users; errors are retried later.
+    if not state["is_valid_ai_topic"]:
+        if (state.get("error") or "").startswith("Error validating topic"):
+            raise RuntimeError(state["error"])
+    else:
+        state = fetch_papers(state)
+        if not state.get("papers"):
+            raise RuntimeError(state.get("error") or "No papers fetched")
+        state = generate_comprehensive_summary(state)
+        if state.get("error"):
+            raise RuntimeError(state["error"])
+
+    index = []
+    arrays = {}
+    for i, paper in enumerate(state.get("papers", [])):
+        embedded = embed_paper(paper)
+        if not embedded:
+            index.append(None)
+            continue
+        arrays[f"chunks_{i}"] = np.asarray(embedded["embeddings"], dtype=np.float32)
+        arrays[f"sentences_{i}"] = np.asarray(embedded["sentence_embeddings"], dtype=np.float16)
+        index.append({
+            "arxiv_id": paper["arxiv_id"],
+            "ids": embedded["ids"],
+            "metadatas": embedded["metadatas"],
+            "texts": embedded["texts"],
+            "sentences": embedded["sentences"],
+            "sentence_word_starts": embedded["sentence_word_starts"]
+        })
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "topic": normalize_topic(topic),
+        "created_at": time.time(),
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_dimension": EMBEDDING_DIMENSION,
+        "is_valid_ai_topic": state["is_valid_ai_topic"],
+        "error": state.get("error"),
+        "papers": state.get("papers", []),
+        "comprehensive_summary": state.get("comprehensive_summary"),
+        "index": index
+    }
+    version = _write_snapshot(topic_key(topic), manifest, arrays)
+    logger.info(f"Wrote snapshot v{version} for topic '{topic}'")
+    return version
+
+
+# Serving
+
+def clone_snapshot(manifest: Dict, session_id: str) -> Dict:
+    from agents.rag_builder import embed_abstracts, index_embedded_paper
+    from corpus import acquire_papers, unindexed_papers
+    from vector_store import upsert_chunks
+
+    papers = manifest["papers"]
+    paper_ids = [paper["arxiv_id"] for paper in papers]
+    acquire_papers(session_id, paper_ids)
+
+    # Papers other sessions keep in the shared corpus need nothing; the rest
+    # are indexed straight from the snapshot's embeddings.
+    pending = set(unindexed_papers(paper_ids))
+    if pending:
+        without_text = []
+        path = os.path.join(_version_path(manifest["key"], manifest["version"]), "embeddings.npz")
+        with np.load(path) as arrays:
+            for i, (paper, entry) in enumerate(zip(papers, manifest["index"])):
+                if paper["arxiv_id"] not in pending:
+                    continue
+                if entry is None:
+                    without_text.append(paper)
+                    continue
+                index_embedded_paper(paper["arxiv_id"], {
+                    **entry,
+                    "embeddings": arrays[f"chunks_{i}"],
+                    "sentence_embeddings": arrays[f"sentences_{i}"]
+                })
+        if without_text:
+            abstracts = embed_abstracts(without_text)
+            if abstracts["ids"]:
+                upsert_chunks(**abstracts)
+            for paper in without_text:
+                index_embedded_paper(paper["arxiv_id"], None)
+
+    return {
+        "comprehensive_summary": manifest["comprehensive_summary"],
+        "papers": papers,
+        "paper_ids": paper_ids,
+        "rag_ready": True,
+        "rag_progress": "ready",
+        "snapshot_version": manifest["version"]
+    }
+
+
+# Export / import between nodes
+
+def export_snapshots(out: BinaryIO, topics: Optional[List[str]] = None) -> int:
+    keys = [topic_key(topic) for topic in topics] if topics else [s["key"] for s in list_snapshots()]
+    count = 0
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for key in keys:
+            manifest = load_manifest(key)
+            if manifest is None:
+                continue
+            path = _version_path(key, manifest["version"])
+            for name in ("manifest.json", "embeddings.npz"):
+                archive.write(os.path.join(path, name), f"{key}/v{manifest['version']}/{name}")
+            count += 1
+    return count
+
+
+def import_snapshots(src: BinaryIO) -> List[str]:
+    imported = []
+    with zipfile.ZipFile(src) as archive:
+        members = {}
+        for name in archive.namelist():
+            match = _MEMBER.match(name)
+            if match:
+                members.setdefault((match.group(1), int(match.group(2))), {})[match.group(3)] = name
+
+        for (key, _), files in sorted(members.items()):
+            if len(files) != 2:
+                continue
+            manifest = json.loads(archive.read(files["manifest.json"]))
+            if not _compatible(manifest) or topic_key(manifest["topic"]) != key:
+                logger.warning(f"Skipping incompatible snapshot {key} in import")
+                continue
+            local = load_manifest(key)
+            if local is not None and local["created_at"] >= manifest["created_at"]:
+                continue
+            with archive.open(files["embeddings.npz"]) as f:
+                with np.load(f) as data:
+                    arrays = {name: data[name] for name in data.files}
+            version = _write_snapshot(key, manifest, arrays)
+            imported.append(f"{manifest['topic']} (v{version})")
+    return imported
+
+
+# Scheduler
+
+def in_off_peak(now: Optional[datetime] = None) -> bool:
+    start, _, end = PREWARM_HOURS.partition("-")
+    hour = (now or datetime.now()).hour
+    start, end = int(start), int(end or start)
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def _system_idle() -> bool:
+    from admission import admission
+
+    ingest = admission.metrics()["kinds"].get("ingest", {})
+    return not ingest.get("active") and not ingest.get("queued")
+
+
+def run_prewarm_pass(force: bool = False, topics: Optional[List[str]] = None) -> int:
+    # `force` ignores the off-peak window and batch size; topics passed in
+    # explicitly are rebuilt even when their snapshot is still fresh.
+    explicit = topics is not None
+    built = 0
+    for topic in topics if explicit else prewarm_topics():
+        if not force and (built >= PREWARM_BATCH or not (in_off_peak() and _system_idle())):
+            break
+        key = topic_key(topic)
+        if not explicit and (latest_snapshot(topic, SNAPSHOT_REFRESH_HOURS) or _failed_until.get(key, 0) > time.time()):
+            continue
+        try:
+            build_snapshot(topic)
+            _failed_until.pop(key, None)
+            built += 1
+        except Exception as e:
+            logger.error(f"Error prewarming topic '{topic}': {str(e)}")
+            _failed_until[key] = time.time() + PREWARM_RETRY_SECONDS
+    return built
+
+
+def _schedule_forever():
+    while not _scheduler_stop.is_set():
+        try:
+            built = run_prewarm_pass()
+            if built:
+                logger.info(f"Prewarmed {built} topic snapshots")
+        except Exception as e:
+            logger.error(f"Error in prewarm pass: {str(e)}")
+        _scheduler_stop.wait(PREWARM_INTERVAL_SECONDS)
+
+
+def start_prewarm_scheduler():
+    _scheduler_stop.clear()
+    threading.Thread(target=_schedule_forever, name="prewarm-scheduler", daemon=True).start()
+
+
+def stop_prewarm_scheduler():
+    _scheduler_stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute, list, export and import topic snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Build snapshots for due topics now, ignoring the off-peak window")
+    run.add_argument("--topic", action="append", help="Topic to build (repeatable); defaults to the prewarm list")
+    commands.add_parser("list", help="List stored snapshots")
+    export = commands.add_parser("export", help="Write the latest snapshots to a zip file")
+    export.add_argument("path")
+    export.add_argument("--topic", action="append")
+    load = commands.add_parser("import", help="Import snapshots from a zip file or another node's export URL")
+    load.add_argument("source")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    if args.command == "run":
+        print(f"Built {run_prewarm_pass(force=True, topics=args.topic)} snapshots")
+    elif args.command == "list":
+        for snapshot in list_snapshots():
+            created = datetime.fromtimestamp(snapshot["created_at"]).isoformat(timespec="seconds")
+            print(f"{snapshot['key']}  v{snapshot['version']}  {created}  {snapshot['topic']}"
+                  f"{'  (stale)' if snapshot['stale'] else ''}")
+    elif args.command == "export":
+        with open(args.path, "wb") as f:
+            print(f"Exported {export_snapshots(f, args.topic)} snapshots to {args.path}")
+    elif args.command == "import":
+        if args.source.startswith(("http://", "https://")):
+            import requests
+
+            response = requests.get(args.source, timeout=300)
+            response.raise_for_status()
+            imported = import_snapshots(io.BytesIO(response.content))
+        else:
+            with open(args.source, "rb") as f:
+                imported = import_snapshots(f)
+        print(f"Imported {len(imported)} snapshots" + "".join(f"\n  {topic}" for topic in imported))
+
+
+if __name__ == "__main__":
+    main()
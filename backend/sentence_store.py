@@ -0,0 +1,89 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+_sentence_store = None
+
+
+# One .npz file per paper holding its sentences (newline-joined), the word
+# offset where each sentence starts in the paper text, and float16 sentence
+# embeddings. Files are replaced atomically, so any process may write them.
+class SentenceStore:
+    def __init__(self, directory: str, cache_size: int = 64):
+        self.directory = directory
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, arxiv_id: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9._-]", "_", arxiv_id) + ".npz")
+
+    def _remember(self, arxiv_id: str, entry: Dict):
+        self._cache[arxiv_id] = entry
+        self._cache.move_to_end(arxiv_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def put(self, arxiv_id: str, sentences: List[str], word_starts: List[int], embeddings: np.ndarray):
+        entry = {
+            "sentences": list(sentences),
+            "word_starts": np.asarray(word_starts, dtype=np.int32),
+            "embeddings": np.asarray(embeddings, dtype=np.float16)
+        }
+        path = self._path(arxiv_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                sentences=np.array("\n".join(entry["sentences"])),
+                word_starts=entry["word_starts"],
+                embeddings=entry["embeddings"]
+            )
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(arxiv_id, entry)
+
+    def get(self, arxiv_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._cache.get(arxiv_id)
+            if entry is not None:
+                self._cache.move_to_end(arxiv_id)
+                return entry
+
+        path = self._path(arxiv_id)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            joined = str(data["sentences"])
+            entry = {
+                "sentences": joined.split("\n") if joined else [],
+                "word_starts": data["word_starts"],
+                "embeddings": data["embeddings"]
+            }
+        with self._lock:
+            self._remember(arxiv_id, entry)
+        return entry
+
+    def delete(self, arxiv_id: str):
+        with self._lock:
+            self._cache.pop(arxiv_id, None)
+        try:
+            os.remove(self._path(arxiv_id))
+        except FileNotFoundError:
+            pass
+
+
+def get_sentence_store() -> SentenceStore:
+    global _sentence_store
+    if _sentence_store is None:
+        _sentence_store = SentenceStore(os.path.join(os.getenv("DATA_DIR", "data"), "sentences"))
+    return _sentence_store
@@ -1,8 +1,9 @@
 import uuid
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,6 +12,10 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 sessions: Dict[str, Dict] = {}
+_expiry_callbacks: List[Callable[[str], None]] = []
+# Expiry callbacks delete vectors and files, and sessions expire inside async
+# request handlers, so the callbacks run on one background thread instead.
+_expiry_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-expiry")
 
 
 def get_hf_api_token(user_provided_token: Optional[str], task: str) -> str:
@@ -46,13 +51,30 @@ def store_session(session_id: str, data: Dict):
     logger.info(f"Session {session_id} created")
 
 
+def on_session_expired(callback: Callable[[str], None]):
+    _expiry_callbacks.append(callback)
+
+
+def _run_expiry_callbacks(session_id: str):
+    for callback in _expiry_callbacks:
+        try:
+            callback(session_id)
+        except Exception as e:
+            logger.error(f"Error in session expiry callback for {session_id}: {str(e)}")
+
+
+def _expire_session(session_id: str):
+    sessions.pop(session_id, None)
+    _expiry_executor.submit(_run_expiry_callbacks, session_id)
+
+
 def get_session(session_id: str) -> Optional[Dict]:
     if session_id in sessions:
         session = sessions[session_id]
         if datetime.now() < session["expires_at"]:
             return session["data"]
         else:
-            del sessions[session_id]
+            _expire_session(session_id)
             logger.info(f"Session {session_id} expired and removed")
     return None
 
@@ -61,7 +83,7 @@ def cleanup_expired_sessions():
     expired = [sid for sid, session in sessions.items() 
                if datetime.now() >= session["expires_at"]]
     for sid in expired:
-        del sessions[sid]
+        _expire_session(sid)
     if expired:
         logger.info(f"Cleaned up {len(expired)} expired sessions")
 
@@ -78,6 +100,23 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]
     return chunks
 
 
+def split_sentences(text: str, min_words: int = 5, max_words: int = 60) -> List[Tuple[int, str]]:
+    # Word offsets match the word positions chunk_text works with, so a chunk's
+    # sentences are the ones starting inside its word window.
+    words = text.split()
+    sentences = []
+    start = 0
+    
+    for i, word in enumerate(words):
+        length = i - start + 1
+        if word.endswith((".", "!", "?")) or length >= max_words or i == len(words) - 1:
+            if length >= min_words:
+                sentences.append((start, ' '.join(words[start:i + 1])))
+            start = i + 1
+    
+    return sentences
+
+
 def truncate_text(text: str, max_length: int = 1000) -> str:
     if len(text) <= max_length:
         return text
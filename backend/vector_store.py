@@ -0,0 +1,447 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from chunk_store import get_chunk_store
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSION = 384
+_ROW_BYTES = EMBEDDING_DIMENSION * 4
+PAPERS_NAMESPACE = os.getenv("PINECONE_NAMESPACE", "papers")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "float32")
+CHUNK_TEXT_STORE = os.getenv("CHUNK_TEXT_STORE", "local")
+COMPACT_DEAD_FRACTION = float(os.getenv("COMPACT_DEAD_FRACTION", "0.3"))
+COMPACT_MIN_ROWS = int(os.getenv("COMPACT_MIN_ROWS", "1024"))
+QUANTIZATIONS = ("float32", "float16", "int8")
+
+_index = None
+_local_store = None
+
+
+def get_index():
+    global _index
+    if _index is None:
+        from pinecone import Pinecone, ServerlessSpec
+
+        pinecone_api_key = os.getenv("PINECONE_API_KEY")
+        if not pinecone_api_key:
+            raise ValueError("PINECONE_API_KEY not found in environment variables")
+
+        pc = Pinecone(api_key=pinecone_api_key)
+        index_name = os.getenv("PINECONE_INDEX_NAME", "research-papers-rag")
+
+        if index_name not in [i.name for i in pc.list_indexes()]:
+            pc.create_index(
+                name=index_name,
+                dimension=EMBEDDING_DIMENSION,
+                metric="cosine",
+                spec=ServerlessSpec(
+                    cloud="aws",
+                    region=os.getenv("PINECONE_ENVIRONMENT", "us-east-1")
+                )
+            )
+
+        _index = pc.Index(index_name)
+    return _index
+
+
+def chunk_id(arxiv_id: str, chunk_index: int) -> str:
+    return f"{arxiv_id}_{chunk_index}"
+
+
+def abstract_id(arxiv_id: str) -> str:
+    return f"{arxiv_id}_abstract"
+
+
+def quantize(embeddings: np.ndarray, quantization: str):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if quantization == "int8":
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(embeddings / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    return embeddings.astype(quantization), np.ones(len(embeddings), dtype=np.float32)
+
+
+# Keeps the searchable copy of every embedding in RAM at the configured
+# precision and the float32 originals in an append-only file that is only
+# memory-mapped to rescore the oversampled candidates of a query. Deleted and
+# overwritten rows are reclaimed by compaction once they pass
+# COMPACT_DEAD_FRACTION of the file: both files are rewritten with live rows
+# only, and a header line in vectors.jsonl names the float32 file it indexes,
+# so a crash mid-compaction leaves the previous pair intact.
+class LocalVectorStore:
+    def __init__(self, directory: str, quantization: str = "float32", oversample: int = 4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization '{quantization}', expected one of {QUANTIZATIONS}")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.quantization = quantization
+        self.oversample = oversample
+        self._full_path = os.path.join(directory, "vectors.f32")
+        self._rows_path = os.path.join(directory, "vectors.jsonl")
+        self._lock = threading.Lock()
+
+        self._codes = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.int8 if quantization == "int8" else quantization)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._file_rows = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Optional[Dict]] = []
+        self._row_of: Dict[str, int] = {}
+        self._rows_by_paper: Dict[str, set] = {}
+        self._file_row_count = 0
+        self._full = None
+
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._rows_path):
+            if os.path.exists(self._full_path):
+                self._file_row_count = os.path.getsize(self._full_path) // _ROW_BYTES
+            return
+
+        live: Dict[str, tuple] = {}
+        file_row = 0
+        complete_bytes = 0
+        with open(self._rows_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                complete_bytes += len(line)
+                record = json.loads(line)
+                if "data" in record:
+                    self._full_path = os.path.join(self.directory, record["data"])
+                    continue
+                if "deleted" in record:
+                    live.pop(record["deleted"], None)
+                    continue
+                vector_id = record.pop("id")
+                # Records written before rows were stored explicitly are in file order.
+                live[vector_id] = (record.pop("row", file_row), record)
+                file_row += 1
+        # Drop a line cut short by a crash so the next append starts cleanly.
+        if complete_bytes < os.path.getsize(self._rows_path):
+            with open(self._rows_path, "r+b") as f:
+                f.truncate(complete_bytes)
+        if os.path.exists(self._full_path):
+            self._file_row_count = os.path.getsize(self._full_path) // _ROW_BYTES
+        # Float32 files left behind by an interrupted compaction.
+        for name in os.listdir(self.directory):
+            if name.endswith(".f32") and os.path.join(self.directory, name) != self._full_path:
+                os.remove(os.path.join(self.directory, name))
+
+        if live:
+            entries = sorted(live.items(), key=lambda item: item[1][0])
+            full = self._memmap()
+            for start in range(0, len(entries), 10000):
+                block = entries[start:start + 10000]
+                rows = np.array([file_row for _, (file_row, _) in block], dtype=np.int64)
+                self._append_rows(
+                    [vector_id for vector_id, _ in block],
+                    np.asarray(full[rows]),
+                    [metadata for _, (_, metadata) in block],
+                    rows
+                )
+        logger.info(f"Loaded {len(self._row_of)} vectors ({self.quantization}) from {self._rows_path}")
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        dead = self._file_row_count - len(self._row_of)
+        if self._file_row_count >= COMPACT_MIN_ROWS and dead > COMPACT_DEAD_FRACTION * self._file_row_count:
+            self._compact()
+
+    def _compact(self):
+        live_rows = np.array(sorted(self._row_of.values()), dtype=np.int64)
+        ids = [self._ids[row] for row in live_rows]
+        metadatas = [self._metadata[row] for row in live_rows]
+        generation = int(time.time() * 1000)
+        while os.path.exists(os.path.join(self.directory, f"vectors.{generation}.f32")):
+            generation += 1
+        full_name = f"vectors.{generation}.f32"
+        full_path = os.path.join(self.directory, full_name)
+        rows_tmp = f"{self._rows_path}.tmp"
+
+        full = self._memmap()
+        with open(full_path, "wb") as f:
+            for start in range(0, len(live_rows), 10000):
+                f.write(np.ascontiguousarray(full[self._file_rows[live_rows[start:start + 10000]]]).tobytes())
+        with open(rows_tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"data": full_name}) + "\n")
+            for row, (vector_id, metadata) in enumerate(zip(ids, metadatas)):
+                f.write(json.dumps({"id": vector_id, "row": row, **metadata}) + "\n")
+        # The jsonl replace is the commit point: before it the old pair is live.
+        os.replace(rows_tmp, self._rows_path)
+        old_full_path = self._full_path
+        self._full_path = full_path
+        self._full = None
+        if old_full_path != full_path and os.path.exists(old_full_path):
+            os.remove(old_full_path)
+
+        count = len(live_rows)
+        self._codes = self._codes[live_rows].copy()
+        self._scales = self._scales[live_rows].copy()
+        self._file_rows = np.arange(count, dtype=np.int64)
+        self._size = count
+        self._file_row_count = count
+        self._ids = ids
+        self._metadata = metadatas
+        self._row_of = {vector_id: row for row, vector_id in enumerate(ids)}
+        self._rows_by_paper = {}
+        for row, metadata in enumerate(metadatas):
+            self._rows_by_paper.setdefault(metadata.get("arxiv_id", ""), set()).add(row)
+        logger.info(f"Compacted local vector store to {count} live vectors")
+
+    def _memmap(self):
+        if self._full is None or self._full.shape[0] != self._file_row_count:
+            self._full = np.memmap(
+                self._full_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self._file_row_count, EMBEDDING_DIMENSION)
+            )
+        return self._full
+
+    def _append_rows(self, ids: List[str], embeddings: np.ndarray, metadatas: List[Dict], file_rows: np.ndarray):
+        count = len(ids)
+        if self._size + count > len(self._codes):
+            capacity = max(self._size + count, 2 * len(self._codes), 1024)
+            self._codes = np.resize(self._codes, (capacity, EMBEDDING_DIMENSION))
+            self._scales = np.resize(self._scales, capacity)
+            self._file_rows = np.resize(self._file_rows, capacity)
+
+        codes, scales = quantize(embeddings, self.quantization)
+        end = self._size + count
+        self._codes[self._size:end] = codes
+        self._scales[self._size:end] = scales
+        self._file_rows[self._size:end] = file_rows
+
+        for offset, (vector_id, metadata) in enumerate(zip(ids, metadatas)):
+            row = self._size + offset
+            self._drop_row(self._row_of.get(vector_id))
+            self._ids.append(vector_id)
+            self._metadata.append(metadata)
+            self._row_of[vector_id] = row
+            self._rows_by_paper.setdefault(metadata.get("arxiv_id", ""), set()).add(row)
+        self._size = end
+
+    def _drop_row(self, row: Optional[int]):
+        if row is None:
+            return
+        papers = self._rows_by_paper.get(self._metadata[row].get("arxiv_id", ""))
+        if papers is not None:
+            papers.discard(row)
+            if not papers:
+                del self._rows_by_paper[self._metadata[row].get("arxiv_id", "")]
+        del self._row_of[self._ids[row]]
+        self._ids[row] = None
+        self._metadata[row] = None
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, metadatas: List[Dict], replaces: Optional[List[str]] = None):
+        # Vectors in `replaces` are dropped under the same lock, so queries see
+        # either the old vectors or the new ones, never a mix or neither.
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock:
+            # Row positions come from the float32 file itself and are recorded
+            # with each id, so rows orphaned by a crash between the two writes
+            # never shift later vectors onto the wrong originals.
+            with open(self._full_path, "ab") as f:
+                start = f.tell() // _ROW_BYTES
+                f.truncate(start * _ROW_BYTES)
+                f.write(embeddings.tobytes())
+            with open(self._rows_path, "a", encoding="utf-8") as f:
+                for offset, (vector_id, metadata) in enumerate(zip(ids, metadatas)):
+                    f.write(json.dumps({"id": vector_id, "row": start + offset, **metadata}) + "\n")
+
+            file_rows = np.arange(start, start + len(ids), dtype=np.int64)
+            self._file_row_count = start + len(ids)
+            self._append_rows(ids, embeddings, metadatas, file_rows)
+            if replaces:
+                kept = set(ids)
+                self._delete_rows([vector_id for vector_id in replaces if vector_id not in kept])
+            self._maybe_compact()
+
+    def _delete_rows(self, ids: List[str]):
+        present = [vector_id for vector_id in ids if vector_id in self._row_of]
+        if not present:
+            return
+        with open(self._rows_path, "a", encoding="utf-8") as f:
+            for vector_id in present:
+                f.write(json.dumps({"deleted": vector_id}) + "\n")
+        for vector_id in present:
+            self._drop_row(self._row_of[vector_id])
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._delete_rows(ids)
+            self._maybe_compact()
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                vector_id: dict(self._metadata[self._row_of[vector_id]])
+                for vector_id in ids if vector_id in self._row_of
+            }
+
+    def _candidate_rows(self, arxiv_ids: Optional[List[str]]) -> np.ndarray:
+        if arxiv_ids is None:
+            return np.array(sorted(self._row_of.values()), dtype=np.int64)
+        rows = set()
+        for arxiv_id in arxiv_ids:
+            rows |= self._rows_by_paper.get(arxiv_id, set())
+        return np.array(sorted(rows), dtype=np.int64)
+
+    def query(self, vector: np.ndarray, top_k: int, arxiv_ids: Optional[List[str]] = None) -> List[Dict]:
+        return self.query_many(np.asarray(vector, dtype=np.float32).reshape(1, -1), top_k, arxiv_ids)[0]
+
+    def query_many(self, vectors: np.ndarray, top_k: int, arxiv_ids: Optional[List[str]] = None) -> List[List[Dict]]:
+        queries = np.asarray(vectors, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            rows = self._candidate_rows(arxiv_ids)
+            if len(rows) == 0:
+                return [[] for _ in queries]
+
+            # One matrix product scores every question against every candidate.
+            all_scores = (self._codes[rows].astype(np.float32) @ queries.T) * self._scales[rows, None]
+            full = self._memmap() if self.quantization != "float32" else None
+
+            results = []
+            for q, query in enumerate(queries):
+                scores = all_scores[:, q]
+                candidates = rows
+
+                if full is not None:
+                    keep = min(len(rows), top_k * self.oversample)
+                    best = np.argpartition(-scores, keep - 1)[:keep]
+                    candidates = rows[best]
+                    scores = full[self._file_rows[candidates]] @ query
+
+                keep = min(len(candidates), top_k)
+                best = np.argpartition(-scores, keep - 1)[:keep]
+                best = best[np.argsort(-scores[best])]
+                results.append([
+                    {
+                        "id": self._ids[candidates[i]],
+                        "score": float(scores[i]),
+                        "metadata": dict(self._metadata[candidates[i]])
+                    }
+                    for i in best
+                ])
+            return results
+
+def get_local_store() -> LocalVectorStore:
+    global _local_store
+    if _local_store is None:
+        _local_store = LocalVectorStore(
+            os.path.join(os.getenv("DATA_DIR", "data"), "vectors"),
+            quantization=EMBEDDING_QUANTIZATION,
+            oversample=int(os.getenv("RESCORE_OVERSAMPLE", "4"))
+        )
+    return _local_store
+
+
+def upsert_chunks(
+    ids: List[str],
+    embeddings: np.ndarray,
+    metadatas: List[Dict],
+    texts: List[str],
+    replaces: Optional[List[str]] = None
+):
+    if CHUNK_TEXT_STORE == "local":
+        get_chunk_store().put_many(list(zip(ids, texts)))
+    else:
+        metadatas = [{**metadata, "text": text[:900]} for metadata, text in zip(metadatas, texts)]
+
+    kept = set(ids)
+    replaces = [vector_id for vector_id in replaces or [] if vector_id not in kept]
+
+    if VECTOR_BACKEND == "local":
+        get_local_store().upsert(ids, embeddings, metadatas, replaces=replaces)
+        get_chunk_store().delete_many(replaces)
+        return
+
+    index = get_index()
+    vectors = [
+        {"id": vector_id, "values": embedding.tolist(), "metadata": metadata}
+        for vector_id, embedding, metadata in zip(ids, embeddings, metadatas)
+    ]
+    for i in range(0, len(vectors), 100):
+        index.upsert(
+            vectors=vectors[i:i + 100],
+            namespace=PAPERS_NAMESPACE
+        )
+    # Pinecone has no transactions; deleting only after the new vectors are in
+    # means a paper is never left without vectors in between.
+    if replaces:
+        delete_chunks(replaces)
+
+
+def _query_pinecone(vector: np.ndarray, top_k: int, arxiv_ids: List[str]) -> List[Dict]:
+    results = get_index().query(
+        vector=np.asarray(vector, dtype=np.float32).tolist(),
+        top_k=top_k,
+        namespace=PAPERS_NAMESPACE,
+        filter={"arxiv_id": {"$in": arxiv_ids}},
+        include_metadata=True
+    )
+    return [
+        {"id": match.id, "score": match.score, "metadata": dict(match.metadata or {})}
+        for match in results.matches
+    ]
+
+
+def _attach_texts(all_matches: List[List[Dict]]):
+    # Chunks indexed before texts moved out of the metadata still carry them inline.
+    texts = get_chunk_store().get_many([
+        m["id"] for matches in all_matches for m in matches if "text" not in m["metadata"]
+    ])
+    for matches in all_matches:
+        for match in matches:
+            if match["id"] in texts:
+                match["metadata"]["text"] = texts[match["id"]]
+
+
+def query_chunks(vector: np.ndarray, top_k: int, arxiv_ids: List[str]) -> List[Dict]:
+    return query_chunks_many(np.asarray(vector, dtype=np.float32).reshape(1, -1), top_k, arxiv_ids)[0]
+
+
+def query_chunks_many(vectors: np.ndarray, top_k: int, arxiv_ids: List[str]) -> List[List[Dict]]:
+    if VECTOR_BACKEND == "local":
+        all_matches = get_local_store().query_many(vectors, top_k, arxiv_ids)
+    elif len(vectors) == 1:
+        all_matches = [_query_pinecone(vectors[0], top_k, arxiv_ids)]
+    else:
+        # Pinecone has no multi-vector query, so the batch is issued concurrently.
+        with ThreadPoolExecutor(max_workers=min(len(vectors), 8)) as pool:
+            all_matches = list(pool.map(lambda v: _query_pinecone(v, top_k, arxiv_ids), vectors))
+
+    _attach_texts(all_matches)
+    return all_matches
+
+
+def fetch_chunk_metadata(ids: List[str]) -> Dict[str, Dict]:
+    if VECTOR_BACKEND == "local":
+        return get_local_store().fetch(ids)
+    fetched = get_index().fetch(ids=ids, namespace=PAPERS_NAMESPACE)
+    return {vector_id: dict(vector.metadata or {}) for vector_id, vector in (fetched.vectors or {}).items()}
+
+
+def delete_chunks(ids: List[str]):
+    if VECTOR_BACKEND == "local":
+        get_local_store().delete(ids)
+    else:
+        index = get_index()
+        for i in range(0, len(ids), 1000):
+            index.delete(ids=ids[i:i + 1000], namespace=PAPERS_NAMESPACE)
+    get_chunk_store().delete_many(ids)
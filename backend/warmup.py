@@ -0,0 +1,88 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Tuple
+from dotenv import load_dotenv
+from embeddings import get_embedder, embedder_loaded
+from graph import get_research_graph, graph_compiled
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LLM_CLIENT_MODULES = ("langchain_google_genai", "langchain_ollama", "arxiv", "pypdf")
+
+_state: Dict[str, str] = {}
+_warm_seconds: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _import_llm_clients():
+    for module in LLM_CLIENT_MODULES:
+        importlib.import_module(module)
+
+
+def _llm_clients_imported() -> bool:
+    return all(module in sys.modules for module in LLM_CLIENT_MODULES)
+
+
+def _connect_vector_store():
+    import vector_store
+
+    if vector_store.VECTOR_BACKEND == "local":
+        vector_store.get_local_store()
+    else:
+        vector_store.get_index()
+
+
+def _vector_store_connected() -> bool:
+    import vector_store
+
+    return vector_store._local_store is not None or vector_store._index is not None
+
+
+# Each subsystem has a loader and a probe. The probe reflects real state, so a
+# subsystem loaded on first use by a request also counts as warm.
+SUBSYSTEMS: Dict[str, Tuple[Callable[[], object], Callable[[], bool]]] = {
+    "workflow": (get_research_graph, graph_compiled),
+    "llm_clients": (_import_llm_clients, _llm_clients_imported),
+    "embedder": (get_embedder, embedder_loaded),
+    "vector_store": (_connect_vector_store, _vector_store_connected),
+}
+
+
+def _warm_all():
+    for name, (load, _) in SUBSYSTEMS.items():
+        with _lock:
+            _state[name] = "warming"
+        started = time.perf_counter()
+        try:
+            load()
+            status = "warm"
+        except Exception as e:
+            logger.error(f"Failed to warm {name}: {str(e)}")
+            status = f"failed: {str(e)}"
+        with _lock:
+            _state[name] = status
+            _warm_seconds[name] = round(time.perf_counter() - started, 3)
+        logger.info(f"Subsystem {name} {status} after {_warm_seconds[name]}s")
+
+
+def start_background_warmup():
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() != "true":
+        return
+    threading.Thread(target=_warm_all, name="warmup", daemon=True).start()
+
+
+def readiness() -> dict:
+    subsystems = {}
+    with _lock:
+        for name, (_, probe) in SUBSYSTEMS.items():
+            status = "warm" if probe() else _state.get(name, "cold")
+            subsystems[name] = {"status": status, "warm_seconds": _warm_seconds.get(name)}
+    return {
+        "ready": all(s["status"] == "warm" for s in subsystems.values()),
+        "subsystems": subsystems
+    }
@@ -0,0 +1,166 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from typing import Dict, List
+import numpy as np
+from dotenv import load_dotenv
+import job_queue
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1"))
+
+_workers: List[multiprocessing.Process] = []
+_collector_stop = threading.Event()
+
+
+def run_rag_build(job: Dict):
+    from agents.rag_builder import embed_paper
+
+    job_id = job["id"]
+    papers = job["payload"]["papers"]
+    # A retried job resumes after the papers an earlier attempt already published.
+    published = set(job_queue.published_keys(job_id))
+
+    for n, paper in enumerate(papers, 1):
+        if paper["arxiv_id"] in published:
+            continue
+        embedded = embed_paper(paper)
+        if embedded:
+            job_queue.publish_result(
+                job_id,
+                paper["arxiv_id"],
+                {
+                    "ids": embedded["ids"],
+                    "metadatas": embedded["metadatas"],
+                    "texts": embedded["texts"],
+                    "sentences": embedded["sentences"],
+                    "sentence_word_starts": embedded["sentence_word_starts"]
+                },
+                np.concatenate([embedded["embeddings"], embedded["sentence_embeddings"]]).astype(np.float32).tobytes()
+            )
+        else:
+            job_queue.publish_result(job_id, paper["arxiv_id"], {"ids": [], "metadatas": [], "texts": []})
+        job_queue.heartbeat(job_id, f"{n}/{len(papers)} papers embedded")
+
+
+HANDLERS = {
+    "rag_build": run_rag_build,
+}
+
+
+def run_worker(worker_id: str):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    from embeddings import get_embedder
+
+    # Load the model once per process, before the first job arrives.
+    get_embedder()
+    logger.info(f"Worker {worker_id} ready")
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    while not stopping.is_set():
+        job = job_queue.claim(worker_id, list(HANDLERS))
+        if job is None:
+            stopping.wait(WORKER_POLL_SECONDS)
+            continue
+
+        logger.info(f"Worker {worker_id} running {job['kind']} job {job['id']} (attempt {job['attempts']})")
+        try:
+            HANDLERS[job["kind"]](job)
+            job_queue.complete(job["id"])
+        except Exception as e:
+            logger.error(f"Job {job['id']} raised: {str(e)}")
+            job_queue.fail(job["id"], str(e))
+
+
+def start_worker_pool(count: int = INGEST_WORKERS):
+    context = multiprocessing.get_context("spawn")
+    for n in range(count):
+        process = context.Process(target=run_worker, args=(f"worker-{os.getpid()}-{n}",), daemon=True)
+        process.start()
+        _workers.append(process)
+    logger.info(f"Started {count} ingest worker processes")
+
+
+def stop_worker_pool():
+    for process in _workers:
+        process.terminate()
+    for process in _workers:
+        process.join(timeout=10)
+    _workers.clear()
+
+
+def collect_results() -> int:
+    from agents.rag_builder import index_embedded_paper
+    from corpus import is_referenced, unindexed_papers
+    from vector_store import EMBEDDING_DIMENSION
+
+    results = job_queue.uncollected_results()
+    for result in results:
+        arxiv_id = result["item_key"]
+        payload = result["payload"]
+        # Session references live in memory and are gone after an API restart,
+        # so unreferenced results are still indexed unless the corpus already
+        # has the paper; a later session holding it garbage-collects it.
+        if is_referenced(arxiv_id) or unindexed_papers([arxiv_id]):
+            embedded = None
+            if payload["ids"]:
+                embeddings = np.frombuffer(result["data"], dtype=np.float32).reshape(-1, EMBEDDING_DIMENSION)
+                embedded = {
+                    **payload,
+                    "embeddings": embeddings[:len(payload["ids"])],
+                    "sentence_embeddings": embeddings[len(payload["ids"]):]
+                }
+            index_embedded_paper(arxiv_id, embedded)
+        job_queue.mark_collected(result["job_id"], arxiv_id)
+
+    for job_id in job_queue.finish_collected_jobs():
+        logger.info(f"RAG build job {job_id} collected")
+    return len(results)
+
+
+def _collect_forever():
+    while not _collector_stop.is_set():
+        try:
+            if collect_results():
+                continue
+        except Exception as e:
+            logger.error(f"Error collecting ingest results: {str(e)}")
+        _collector_stop.wait(WORKER_POLL_SECONDS)
+
+
+def start_result_collector():
+    _collector_stop.clear()
+    threading.Thread(target=_collect_forever, name="ingest-collector", daemon=True).start()
+
+
+def stop_result_collector():
+    _collector_stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ingest workers against the durable job queue")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    args = parser.parse_args()
+
+    start_worker_pool(args.workers)
+    try:
+        for process in _workers:
+            process.join()
+    except KeyboardInterrupt:
+        stop_worker_pool()
+
+
+if __name__ == "__main__":
+    main()
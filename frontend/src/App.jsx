@@ -1,15 +1,37 @@
-﻿import { useState } from 'react';
+﻿import { useState, useEffect } from 'react';
 import TopicInput from './components/TopicInput';
 import ComprehensiveSummary from './components/ComprehensiveSummary';
 import PapersList from './components/PapersList';
 import ChatInterface from './components/ChatInterface';
-import { processTopic, queryRAG } from './api';
+import { processTopic, queryRAG, getSession } from './api';
 
 function App() {
   const [view, setView] = useState('input');
   const [results, setResults] = useState(null);
   const [error, setError] = useState('');
 
+  useEffect(() => {
+    // Sessions answer from abstracts right away; keep polling until the full
+    // text of every paper has been indexed.
+    const progress = results?.rag_progress;
+    if (!results?.session_id || !progress || progress === 'ready' || progress.includes('failed')) {
+      return;
+    }
+
+    const timer = setInterval(async () => {
+      try {
+        const session = await getSession(results.session_id);
+        setResults(prev => prev?.session_id === results.session_id
+          ? { ...prev, rag_ready: session.rag_ready, rag_progress: session.rag_progress }
+          : prev);
+      } catch (err) {
+        clearInterval(timer);
+      }
+    }, 2000);
+
+    return () => clearInterval(timer);
+  }, [results?.session_id, results?.rag_progress]);
+
   const handleTopicSubmit = async (topic) => {
     setError('');
     try {
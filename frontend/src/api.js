@@ -37,6 +37,17 @@ export async function queryRAG(sessionId, question) {
   return response.json();
 }
 
+export async function getSession(sessionId) {
+  const response = await fetch(`${API_BASE_URL}/api/sessions/${sessionId}`);
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || 'Failed to fetch session');
+  }
+
+  return response.json();
+}
+
 /**
  * Check API health status
  * @returns {Promise<Object>} Health status
@@ -85,7 +85,12 @@ export default function ChatInterface({ sessionId, geminiApiKey, onQuery, ragRea
             <svg className="h-4 w-4 text-green-600 mr-2" fill="currentColor" viewBox="0 0 20 20">
               <path fillRule="evenodd" d="M10 18a8 8 0 100-16 8 8 0 000 16zm3.707-9.293a1 1 0 00-1.414-1.414L9 10.586 7.707 9.293a1 1 0 00-1.414 1.414l2 2a1 1 0 001.414 0l4-4z" clipRule="evenodd" />
             </svg>
-            <p className="text-xs text-green-800 font-medium">RAG System Active - Ready for questions!</p>
+            <div className="flex-1">
+              <p className="text-xs text-green-800 font-medium">RAG System Active - Ready for questions!</p>
+              {ragProgress && ragProgress !== 'ready' && (
+                <p className="text-xs text-green-700 mt-1">{ragProgress}</p>
+              )}
+            </div>
           </div>
         </div>
       )}